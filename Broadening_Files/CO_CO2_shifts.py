@@ -10,97 +10,66 @@ Sample input and output files are included.
 Note that the program can be easily modified for any other file formats.
 '''
 
-from astropy.io import ascii
-from astropy.table import Table, Column
 import numpy as np
-import sys
-import os
+
+from broadeners.cli import parse_args, run
+from broadeners.quanta import running_index, branch_sign
+from broadeners.coefficients import load_plan
+from broadeners.shifts import multipliers, line_shifts
 
 #--------------read CO HITRAN data-------------------------------
 
-readpath = input('input HITRAN 160 .par file to do the calculation for CO2-shifts of CO:')
-
-savepath = input('output file name:')
-
-file1 = open(readpath,'r') 
-table = file1.read()
-file1.close
-
-total = ascii.read(table, Reader=ascii.FixedWidthNoHeader,
-                         names=('hitpar','Br','J','v_f','v_i'),
-                         col_starts=(0,  117,118, 79, 96),
-                         col_ends = (159,117,120, 86, 99),
-                         )
-
-# unused columns in next steps
-Parline= np.array(total['hitpar'])
-
-# column used in next steps
-Branch= np.array(total['Br'])
-J= np.array(total['J'])
-v1_f= np.array(total['v_f'])
-v1_i= np.array(total['v_i'])
-
-#-----------------calcuating |m| for CO lines----------------------------------
-# *Note that m stands for |m| which is related to the lower J rotational quantum number as follows:
-# P branch: m = -J" (However in this work we are using |m| so for P branches this is just J")
-# Q branch: m = J"
-# R branch: m = J" + 1
-
-ms = []
-inx = []
-for i in range(len(Branch)):
-    if Branch[i]=='R':
-        ms.append(J[i]+1) 
-        inx.append(-1)
-    elif Branch[i]=='P':
-        ms.append(J[i])
-        inx.append(1)
-    elif Branch[i]=='Q':
-        ms.append(J[i])
-        inx.append(0)
-    else:
-        pass
-
-#-----------------calcuating multipliers for CO lines----------------------------------
-a_CO2 = [0.5] #VP
-
-for i in range(len(Branch)):
-    multipliers_CO2 = a_CO2*(v1_f-v1_i)
-    
-#-------------Function for generating shift values for CO broadened by CO2 -----------------------------
-def dCO2(x, y, z): 
-    alph1_rot = 1.25396
-    alph2_rot = -2.05688
-    alph3_rot = 0.803285
-    beta2_rot = 0.001053
-    beta3_rot = 0.002796
-    alph1_vib = 0.01503
-    alph2_vib = 0.02691
-    alph3_vib = -0.04405
-    beta2_vib = 0.02746
-    beta3_vib = 0.008576
-    ddCO2 = (y*(alph1_rot+alph2_rot*np.exp(-x*beta2_rot)+alph3_rot*np.exp(-x*beta3_rot))+
-            (z*(alph1_vib+alph2_vib*np.exp(-x*beta2_vib)+alph3_vib*np.exp(-x*beta3_vib))))
-    return ddCO2# x in this calculation stands for |m|, y stands for inx values, and z are the multiplier values
-
-#--------------Fill empty lists with calculated broadening-------------------------------
-
-CO2_shifts = []
-err_CO2 = []
-ref_CO2 = []
-
-for i in range(len(Branch)):
-    x = ms[i]
-    y = inx[i]
-    z = multipliers_CO2[i]
-    CO2_shifts.append(float(dCO2(x, y, z)))# CO2 pressure-induced line shifts
-    err_CO2.append("3")                     # CO2 shifts uncertainty code
-    ref_CO2.append("1345")# CO2 shifts data references: Described in Tan et al. 2022 For the CO-CO2 system, the measured data from Hashemi et al. 2016 http://dx.doi.org/10.1016/j.jms.2016.02.014 is used to extrapolate the broadening for all the transitions
-    
+PROMPT = 'input HITRAN 160 .par file to do the calculation for CO2-shifts of CO:'
+
+COLUMNS = dict(names=('Br','J','v_f','v_i'),
+               col_starts=(117,118, 79, 96),
+               col_ends=(117,120, 86, 99))
+
+#-------------shift model of CO broadened by CO2 -----------------------------
+# alph1-3_rot, beta2-3_rot, alph1-3_vib, beta2-3_vib and the multiplier of the
+# vibrational term are read from coefficients/CO.json, shared with CO.py and
+# the other shift scripts, as are the uncertainty code and reference
+PLAN = load_plan('CO')
+DELTA_CO2 = PLAN.parameter('CO2', 'delta') # model, uncertainty code and reference
+D_CO2 = DELTA_CO2['model']
+
+#-----------------lookup table of the shift terms over |m|--------------------------
+TABLE = PLAN.shift_table('CO2')
+
+#--------------broaden one chunk of lines-------------------------------
+
+def broaden(total):
+    # column used in next steps
+    Branch= np.array(total['Br'])
+    J= np.array(total['J'])
+    v1_f= np.array(total['v_f'])
+    v1_i= np.array(total['v_i'])
+
+    #-----------------calcuating |m| for CO lines----------------------------------
+    # *Note that m stands for |m| which is related to the lower J rotational quantum number as follows:
+    # P branch: m = -J" (However in this work we are using |m| so for P branches this is just J")
+    # Q branch: m = J"
+    # R branch: m = J" + 1
+
+    ms = running_index(Branch, J)
+    inx = branch_sign(Branch)
+
+    #-----------------calcuating multipliers for CO lines----------------------------------
+    multipliers_CO2 = multipliers(v1_f, v1_i, D_CO2)
+
+    #--------------calculate the shifts of every line-------------------------------
+
+    CO2_shifts = line_shifts(TABLE, ms, inx, multipliers_CO2)# CO2 pressure-induced line shifts
+    err_CO2 = [DELTA_CO2['err']] * len(ms) # CO2 shifts uncertainty code
+    ref_CO2 = [DELTA_CO2['ref']] * len(ms) # CO2 shifts data reference (see coefficients/CO.json)
+
+    # output columns in the order they are written by FORMAT
+    return {'CO2_shifts': CO2_shifts, 'err_CO2': err_CO2, 'ref_CO2': ref_CO2}
+
 #------------create new HITRAN data file with CO2 shifts for CO--------
-with open(savepath,'w') as out:
-    for i in range(len(ms)):
-        out.write("%160s, %9.6f, %3s, %3s \n" %( Parline[i], CO2_shifts[i], err_CO2[i], ref_CO2[i]))
-    else:
-        print('end for calculation: output "160.par + delta_CO2" ')
\ No newline at end of file
+FORMAT = "%160s, %9.6f, %3s, %3s \n"
+
+if __name__ == '__main__':
+    args = parse_args(PROMPT)
+    run(args, COLUMNS, broaden, FORMAT)
+    print('end for calculation: output "160.par + delta_CO2" ')
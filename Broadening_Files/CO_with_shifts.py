@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+'''
+This is a Python code provided for calculating gamma_He, n_He, gamma_H2, n_H2,
+gamma_CO2 and n_CO2 together with delta_He, delta_H2 and delta_CO2 of CO
+transitions in the HITRAN database as described in:
+Tan et al, "H$_2$, He, and CO$_2$ line-broadening coefficients, and
+temperature-dependence exponents for the HITRAN database. Part II:
+CO2, N2O, CO, SO2, OH, OCS, H2CO, HCN, PH3, H2S and GeH4",
+Astrophysical Journal Supplement Series, 2022
+It reads the .par file once and writes the columns of CO.py followed by
+those of CO_He_shifts.py, CO_H2_shifts.py and CO_CO2_shifts.py on one line,
+using the broadening and shift models of these scripts.
+Sample input and output files are included.
+Note that the program can be easily modified for any other file formats.
+'''
+
+import CO
+import CO_He_shifts
+import CO_H2_shifts
+import CO_CO2_shifts
+from broadeners.cli import parse_args, run
+
+#--------------read CO HITRAN data-------------------------------
+
+PROMPT = 'input HITRAN 160 .par file to do the calculation for He-, H2- and CO2-broadening, temperature dependence and shifts of CO:'
+
+COLUMNS = dict(names=('Br','J','v_f','v_i'),
+               col_starts=(117,118, 79, 96),
+               col_ends=(117,120, 86, 99))
+
+# (script, its name for the shift column, broadener)
+SHIFTS = ((CO_He_shifts, 'He_shifts', 'He'),
+          (CO_H2_shifts, 'H2_shifts', 'H2'),
+          (CO_CO2_shifts, 'CO2_shifts', 'CO2'))
+
+#--------------broaden one chunk of lines-------------------------------
+
+def broaden(total):
+    # He, H2 and CO2 broadening and temperature dependence
+    values = CO.broaden({'Br': total['Br'], 'J_': total['J']})
+
+    # He, H2 and CO2 pressure-induced line shifts, renamed so they do not clash
+    # with the uncertainty codes and references of the broadening
+    for script, column, gas in SHIFTS:
+        shifts = script.broaden(total)
+        values['delta_' + gas] = shifts[column]
+        values['err_delta_' + gas] = shifts['err_' + gas]
+        values['ref_delta_' + gas] = shifts['ref_' + gas]
+
+    # output columns in the order they are written by FORMAT
+    return values
+
+#------------create new HITRAN data file with He, H2 and CO2 broadening, temperature dependence and shifts for CO--------
+FORMAT = CO.FORMAT.rstrip(' \n') + ''.join(script.FORMAT[len('%160s'):].rstrip(' \n')
+                                           for script, column, gas in SHIFTS) + ' \n'
+
+if __name__ == '__main__':
+    args = parse_args(PROMPT)
+    run(args, COLUMNS, broaden, FORMAT)
+    print('end for calculation: output "160.par + gamma_He + n_He + gamma_H2 + n_H2 + gamma_CO2 + n_CO2 + delta_He + delta_H2 + delta_CO2" ')
@@ -9,97 +9,51 @@ Astrophysical Journal Supplement Series, 2022
 Sample input and output files are included.
 Note that the program can be easily modified for any other file formats.
 '''
-from astropy.io import ascii
-from astropy.table import Table, Column
 import numpy as np
-import sys
 
-#--------------read N2O HITRAN data-------------------------------
-
-readpath = input('input HITRAN 160 .par file to do the calculation for He-broadening and temperature dependence of N2O:')
-
-savepath = input('output file name:')
+from broadeners.cli import parse_args, run
+from broadeners.coefficients import load_plan
+from broadeners.quanta import running_index
 
-file1 = open(readpath,'r') 
-table = file1.read()
-file1.close
-
-total = ascii.read(table, Reader = ascii.FixedWidthNoHeader,
-                         names = ('parline', 'branch', 'J'),
-                         col_starts = (0, 117, 118),
-                         col_ends = (159, 117, 120),
-                         ) # This work assumes the HITRAN .par format is the input data
+#--------------read N2O HITRAN data-------------------------------
 
-# unused columns in next steps
-Parline = np.array(total['parline'])
+PROMPT = 'input HITRAN 160 .par file to do the calculation for He-broadening and temperature dependence of N2O:'
 
-# column used in next steps
-Branch = np.array(total['branch'])
-J = np.array(total['J'])
+COLUMNS = dict(names=('branch', 'J'),
+               col_starts=(117, 118),
+               col_ends=(117, 120)) # This work assumes the HITRAN .par format is the input data
 
-#-----------------calcuating |m| for N2O lines----------------------------------
-# m stands for |m| which is related to the lower J rotational quantum number as follows:
-# P branch: m = -J" (However in this work we are using |m| so for P branches this is just J")
-# Q branch: m = J"
-# R branch: m = J" + 1
+#-----------------broadening models---------------------------------------
+# the He fit of gamma (held at |m| = 40 above 40) and the fixed n with their
+# uncertainty codes and references are read from coefficients/N2O.json and
+# compiled into lookup tables over |m|
+PLAN = load_plan('N2O')
 
-m = []
-for i in range(len(Branch)):
-    if Branch[i]=='R':
-        m.append(J[i]+1)
-    elif Branch[i]=='P':
-        m.append(J[i])
-    elif Branch[i]=='Q':
-        m.append(J[i])
-    if m[i]>40:
-        m[i]=40
-    else:
-        pass
+#--------------broaden one chunk of lines-------------------------------
 
-#-----------------define function for gHe---------------------------------------
-def gHe(x):
-    a0 = 29.92585
-    a1 = 275.28681
-    a2 = -21.0512
-    a3 = 0.78324
-    b1 = 4411.70782
-    b2 = -370.09121
-    b3 = 15.49987
-    b4 = -0.03189
+def broaden(total):
+    # column used in next steps
+    Branch = np.array(total['branch'])
+    J = np.array(total['J'])
 
-    ggHe = ((a0+a1*x+a2*x**2+a3*x**3)/(1+b1*x+b2*x**2+b3*x**3+b4*x**4))
-    return ggHe # x in this calculation stands for |m|
+    #-----------------calcuating |m| for N2O lines----------------------------------
+    # *Note that m stands for |m| which is related to the lower J rotational quantum number as follows:
+    # P branch: m = -J" (However in this work we are using |m| so for P branches this is just J")
+    # Q branch: m = J"
+    # R branch: m = J" + 1
 
-def err_gHe(x):
-    if x<38:
-        err = 5
-    elif x>=38:
-        err = 4
-    return err    
-    
-#--------------Fill empty lists with calculated broadening-------------------------------
+    m = running_index(Branch, J)
 
-gamma_He = []
-err_He = []
-ref_He = []
-n_He = []
-ref_n_He = []
-err_n_He = []
+    #--------------look up the broadening of every line-------------------------------
+    #--The reference numbers are "global reference IDs" in the HITRAN database; coefficients/N2O.json gives the data behind each of them.
 
-#--The reference numbers below correspond to "global reference IDs" in the HITRAN database. The mapping is also provided here in the code."
-for i in range(len(m)):
-    xx = m[i]
-    gamma_He.append(float(gHe(xx))) # He broadening
-    err_He.append(str(err_gHe(xx))) # He uncertainty code
-    ref_He.append("1504") # He Broadening Data References: The He broadening data from Nakayama et al. 2007 https://doi.org/10.1016/j.chemphys.2007.03.001 and from Tasinato et al. 2010 https://doi.org/10.1063/1.3386385 were used to fit the Padé approximant in Tan et al. 2022
-    n_He.append("0.30")   # He Temperature Dependence
-    ref_n_He.append("1515")# He Temperature Dependence Reference: As stated in Tan et al. 2022, due to the lack of He-temperature dependence data for N2O, the He-temperature dependence value from Nakamichi et al. https://doi.org/10.1039/b511772k for CO2 lines is used.
-    err_n_He.append("3")  # He Temperature Dependence Uncertainty Code
+    # output columns in the order they are written by FORMAT
+    return PLAN.evaluate(m=m)
 
 #------------create new HITRAN data file with He broadening for N2O--------
-with open(savepath,'w') as out:
-    for i in range(len(m)):
-        out.write("%160s, %8.4f, %3s, %3s, %3s, %3s, %3s \n" %( Parline[i],
-        gamma_He[i], err_He[i], ref_He[i], n_He[i], err_n_He[i], ref_n_He[i]))
-    else:
-        print('end for calculation: output "160.par + gamma_He + n_He" ')
\ No newline at end of file
+FORMAT = "%160s, %8.4f, %3s, %3s, %3s, %3s, %3s \n"
+
+if __name__ == '__main__':
+    args = parse_args(PROMPT)
+    run(args, COLUMNS, broaden, FORMAT)
+    print('end for calculation: output "160.par + gamma_He + n_He" ')
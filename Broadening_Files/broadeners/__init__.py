@@ -0,0 +1,8 @@
+# -*- coding: utf-8 -*-
+'''
+Shared helpers for the HITRAN planetary broadening scripts.
+
+The molecule scripts in the parent directory (CO.py, CO2.py, H2S.py, ...) use
+this package for the parts of the calculation they have in common, such as
+reading the 160-character HITRAN .par records.
+'''
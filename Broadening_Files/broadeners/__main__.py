@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+'''
+Single entry point for all molecules:
+
+    python -m broadeners MOLECULE [READPATH SAVEPATH] [options]
+
+where MOLECULE is the name of a script: CO, CO2, H2CO, ... run the script of
+the molecule (CO runs CO.py; its shifts are written by CO_He_shifts,
+CO_H2_shifts, CO_CO2_shifts or, all together, CO_with_shifts), and the
+options are those of the scripts. Only NumPy and the modules of the requested output are imported, and
+with --timing the import time is reported on standard error along with the
+time taken, which matters when many small files are broadened as separate
+jobs. Run it from the Broadening_Files directory.
+'''
+
+import time
+
+_STARTED = time.perf_counter()
+
+import sys
+
+from broadeners.cli import parse_args, run
+from broadeners.registry import MOLECULES, load_script
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0].startswith('-'):
+        sys.exit('usage: python -m broadeners MOLECULE [READPATH SAVEPATH] [options]\n'
+                 'molecules: %s (or the name of another script, e.g. CO_with_shifts)'
+                 % ', '.join(MOLECULES))
+    try:
+        script = load_script(argv[0])
+    except (ValueError, ImportError) as error:
+        sys.exit('python -m broadeners: %s' % error)
+    args = parse_args(script.PROMPT, argv=argv[1:])
+    if args.timing:
+        print('imports: %.3f s' % (time.perf_counter() - _STARTED), file=sys.stderr)
+    run(args, script.COLUMNS, script.broaden, script.FORMAT)
+
+if __name__ == '__main__':
+    main()
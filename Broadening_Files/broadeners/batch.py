@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+'''
+Broaden many .par files in one run, on a pool of processes.
+
+The files are given either as a manifest, a text file with one job per line
+
+    # molecule  input                [output]
+    CO          bands/CO_1-0.par
+    CO2         bands/CO2_*.par
+    PH3         PH3.par.gz           PH3_broadened.par.gz
+
+(inputs may be glob patterns, relative names are relative to the manifest,
+lines starting with # are comments), or as a molecule and input patterns on
+the command line:
+
+    python -m broadeners.batch jobs.txt --output-dir out
+    python -m broadeners.batch --molecule CO 'bands/CO_*.par' --workers 8
+
+The molecule is the name of the script that broadens the files (CO runs
+CO.py; CO_with_shifts adds the CO shifts).
+An output without a name is written next to its input, or into --output-dir,
+as NAME_out.par, keeping a compression extension (NAME_out for
+--output-format npy). Every worker process imports each script once, so the
+models are built once per process rather than once per file, and a summary
+with the lines per second of every file is printed at the end. A file that fails is
+reported in the summary and does not stop the others. The files are already
+processed in parallel, so gzip outputs are compressed on one thread each.
+'''
+
+import argparse
+import glob
+import os
+import sys
+import time
+
+from broadeners.compression import compression
+from broadeners.pipeline import DEFAULT_CHUNK_LINES, broaden_file
+from broadeners.registry import load_script
+
+OUTPUT_SUFFIX = '_out'
+
+#--------------jobs-------------------------------
+
+def output_name(readpath, output_dir=None, output_format='par'):
+    '''Return the default output name of readpath.'''
+    directory, name = os.path.split(readpath)
+    ext = compression(name) or ''
+    stem = name[:len(name) - len(ext)]
+    if stem.lower().endswith('.par'):
+        stem = stem[:-len('.par')]
+    if output_format == 'npy':
+        name = stem + OUTPUT_SUFFIX
+    else:
+        name = stem + OUTPUT_SUFFIX + '.par' + ext
+    return os.path.join(directory if output_dir is None else output_dir, name)
+
+def expand_jobs(molecule, pattern, savepath=None, output_dir=None, output_format='par'):
+    '''Return the jobs (molecule, readpath, savepath) of an input name or glob pattern.'''
+    readpaths = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+    if not readpaths:
+        raise ValueError('no input files match %r' % pattern)
+    if savepath is not None and len(readpaths) > 1:
+        raise ValueError('%r matches %d files but gives one output name' % (pattern, len(readpaths)))
+    return [(molecule, readpath,
+             savepath if savepath is not None else output_name(readpath, output_dir, output_format))
+            for readpath in readpaths]
+
+def read_manifest(path, output_dir=None, output_format='par'):
+    '''Return the jobs of a manifest file.'''
+    base = os.path.dirname(os.path.abspath(path))
+    jobs = []
+    with open(path) as f:
+        for number, line in enumerate(f, 1):
+            fields = line.split()
+            if not fields or fields[0].startswith('#'):
+                continue
+            if len(fields) not in (2, 3):
+                raise ValueError('%s, line %d: expected MOLECULE INPUT [OUTPUT], got %r'
+                                 % (path, number, line.strip()))
+            pattern = os.path.join(base, fields[1])
+            savepath = os.path.join(base, fields[2]) if len(fields) == 3 else None
+            jobs.extend(expand_jobs(fields[0], pattern, savepath, output_dir, output_format))
+    return jobs
+
+#--------------run the jobs-------------------------------
+
+def broaden_job(job, options):
+    '''
+    Broaden one job (molecule, readpath, savepath) with the options of
+    broaden_file and return (job, lines, seconds, error).
+    '''
+    molecule, readpath, savepath = job
+    started = time.perf_counter()
+    try:
+        script = load_script(molecule)
+        nlines = broaden_file(readpath, savepath, script.COLUMNS, script.broaden, script.FORMAT,
+                              **options)
+    except Exception as error:
+        return job, 0, time.perf_counter() - started, '%s: %s' % (type(error).__name__, error)
+    return job, nlines, time.perf_counter() - started, None
+
+def run_jobs(jobs, workers=None, **options):
+    '''
+    Run the jobs on workers processes (default: the number of CPUs) and return
+    their results, in the order of the jobs (see broaden_job).
+    '''
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(jobs))
+    if workers <= 1:
+        return [broaden_job(job, options) for job in jobs]
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(workers) as pool:
+        return list(pool.map(broaden_job, jobs, [options] * len(jobs)))
+
+def summary(results, seconds):
+    '''Return the summary table of the results of run_jobs as text.'''
+    rows = ['%-14s %12s %10s %12s  %s' % ('molecule', 'lines', 'seconds', 'lines/s', 'input')]
+    for (molecule, readpath, savepath), nlines, elapsed, error in results:
+        if error is None:
+            rate = '%12.0f' % (nlines / elapsed) if elapsed > 0 else '%12s' % '-'
+            rows.append('%-14s %12d %10.3f %s  %s' % (molecule, nlines, elapsed, rate, readpath))
+        else:
+            rows.append('%-14s %12s %10.3f %12s  %s  FAILED: %s'
+                        % (molecule, '-', elapsed, '-', readpath, error))
+    total = sum(nlines for job, nlines, elapsed, error in results)
+    failed = sum(error is not None for job, nlines, elapsed, error in results)
+    rows.append('%d files (%d failed), %d lines in %.3f s, %.0f lines/s'
+                % (len(results), failed, total, seconds, total / seconds if seconds > 0 else 0))
+    return '\n'.join(rows)
+
+#--------------command line-------------------------------
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m broadeners.batch',
+                                     description='Broaden many .par files on a pool of processes.')
+    parser.add_argument('inputs', nargs='+',
+                        help='a manifest file, or with --molecule the input files or glob patterns')
+    parser.add_argument('--molecule', default=None,
+                        help='molecule (or script) of all inputs given on the command line')
+    parser.add_argument('--output-dir', default=None,
+                        help='directory for the outputs (default: next to the inputs)')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='worker processes (default: number of CPUs)')
+    parser.add_argument('--chunk-lines', type=int, default=DEFAULT_CHUNK_LINES,
+                        help='number of .par lines processed at a time (default %(default)s)')
+    parser.add_argument('--output-format', choices=('par', 'npy'), default='par',
+                        help='output format of every file, as for the scripts (default %(default)s)')
+    args = parser.parse_args(argv)
+    if args.workers is not None and args.workers < 1:
+        parser.error('--workers must be at least 1')
+    if args.chunk_lines < 1:
+        parser.error('--chunk-lines must be at least 1')
+    if args.molecule is None and len(args.inputs) != 1:
+        parser.error('give one manifest file, or --molecule with the input files')
+
+    try:
+        if args.molecule is None:
+            jobs = read_manifest(args.inputs[0], args.output_dir, args.output_format)
+        else:
+            jobs = [job for pattern in args.inputs
+                    for job in expand_jobs(args.molecule, pattern, None, args.output_dir,
+                                           args.output_format)]
+    except (OSError, ValueError) as error:
+        parser.error(str(error))
+    outputs = [os.path.abspath(savepath) for molecule, readpath, savepath in jobs]
+    if len(set(outputs)) != len(outputs):
+        parser.error('several inputs would be written to the same output')
+    if args.output_dir is not None:
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    started = time.perf_counter()
+    results = run_jobs(jobs, workers=args.workers, chunk_lines=args.chunk_lines,
+                       output_format=args.output_format, compress_workers=1)
+    print(summary(results, time.perf_counter() - started))
+    return 1 if any(error is not None for job, nlines, elapsed, error in results) else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
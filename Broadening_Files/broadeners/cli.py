@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+'''
+Command line handling shared by the broadening scripts.
+
+The input and output file names can be given on the command line; any that
+are missing are asked for with input() as before, so running e.g.
+"python CO.py" without arguments behaves exactly like it always has.
+'''
+
+import argparse
+import sys
+import time
+
+from broadeners.pipeline import (DEFAULT_CHUNK_LINES, chunk_lines_for_memory, broaden_file,
+                                 cross_section_file)
+
+_UNITS = {'K': 1024, 'M': 1024**2, 'G': 1024**3, 'T': 1024**4}
+
+def memory_size(text):
+    '''Convert a size such as "512M" or "2G" to a number of bytes.'''
+    text = text.strip().upper().rstrip('B')
+    factor = 1
+    if text and text[-1] in _UNITS:
+        factor = _UNITS[text[-1]]
+        text = text[:-1]
+    try:
+        return int(float(text) * factor)
+    except ValueError:
+        raise argparse.ArgumentTypeError('invalid memory size: %r' % text)
+
+def temperature_list(text):
+    '''Convert a list of temperatures such as "100,200,296" to floats (K).'''
+    try:
+        temperatures = [float(t) for t in text.split(',') if t.strip()]
+    except ValueError:
+        raise argparse.ArgumentTypeError('invalid temperature list: %r' % text)
+    if not temperatures or min(temperatures) <= 0:
+        raise argparse.ArgumentTypeError('temperatures must be positive: %r' % text)
+    return temperatures
+
+def grid_spec(text):
+    '''Convert a wavenumber grid "START,STOP,STEP" (cm-1) to the grid points.'''
+    from broadeners.xsec import wavenumber_grid
+    try:
+        start, stop, step = [float(value) for value in text.split(',')]
+        return wavenumber_grid(start, stop, step)
+    except ValueError:
+        raise argparse.ArgumentTypeError('invalid wavenumber grid (START,STOP,STEP): %r' % text)
+
+def parse_args(prompt, description=None, argv=None):
+    '''
+    Parse the command line of a broadening script.
+
+    prompt is the question used to ask for the input file when it is not
+    given as an argument. The returned namespace has readpath, savepath and
+    chunk_lines set.
+    '''
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument('readpath', nargs='?',
+                        help='input HITRAN 160 .par file (may be .gz, .bz2 or .xz compressed)')
+    parser.add_argument('savepath', nargs='?',
+                        help='output file name (compressed if it ends in .gz, .bz2 or .xz)')
+    memory = parser.add_mutually_exclusive_group()
+    memory.add_argument('--chunk-lines', type=int, default=DEFAULT_CHUNK_LINES,
+                        help='number of .par lines processed at a time (default %(default)s)')
+    memory.add_argument('--max-memory', type=memory_size,
+                        help='approximate memory ceiling for one chunk, e.g. 512M or 2G')
+    parser.add_argument('--output-format', choices=('par', 'npy'), default='par',
+                        help='par: text lines as before; npy: a directory of .npy '
+                             'column files with a JSON manifest (default %(default)s)')
+    parser.add_argument('--compress-workers', type=int, default=None,
+                        help='threads compressing a .gz output (default: number of CPUs)')
+    parser.add_argument('--nu-min', type=float, default=None,
+                        help='only broaden lines with wavenumber >= NU_MIN (cm-1)')
+    parser.add_argument('--nu-max', type=float, default=None,
+                        help='only broaden lines with wavenumber <= NU_MAX (cm-1); a sidecar '
+                             'index made with "python -m broadeners.index" makes this fast')
+    parser.add_argument('--incremental', action='store_true',
+                        help='reuse the lines of an earlier run into the same output for '
+                             'records that have not changed; only new or changed lines '
+                             'are broadened')
+    parser.add_argument('--temperatures', type=temperature_list, default=None,
+                        help='comma-separated temperatures (K), e.g. 100,200,296; the npy '
+                             'output then also holds gamma_X_T, the half width of every '
+                             'broadener X at each temperature')
+    parser.add_argument('--profile', default=None,
+                        help='atmosphere profile file (P in atm, T in K and mixing ratios); the '
+                             'npy output then holds gamma_L and nu_L, the mixture half width and '
+                             'shifted position of every line in every layer')
+    parser.add_argument('--cross-section', type=grid_spec, default=None, metavar='START,STOP,STEP',
+                        help='with --profile: save the Voigt absorption cross-sections of every '
+                             'layer on this wavenumber grid (cm-1) to a .npz output file instead')
+    parser.add_argument('--wing-cutoff', type=float, default=None,
+                        help='distance from the line center (cm-1) up to which a line is '
+                             'evaluated in --cross-section (default 25)')
+    parser.add_argument('--overlap-io', action='store_true',
+                        help='read and write on background threads while broadening, '
+                             'for slow or network-mounted storage')
+    parser.add_argument('--timing', action='store_true',
+                        help='report the time taken on standard error')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='processes broadening the file (.par output only) or computing '
+                             '--cross-section (default: 1 for broadening, the number of CPUs '
+                             'for --cross-section)')
+    args = parser.parse_args(argv)
+
+    if args.max_memory is not None:
+        args.chunk_lines = chunk_lines_for_memory(args.max_memory)
+    if args.chunk_lines < 1:
+        parser.error('--chunk-lines must be at least 1')
+    if args.incremental and args.output_format != 'par':
+        parser.error('--incremental needs --output-format par')
+    if args.temperatures is not None and args.output_format != 'npy':
+        parser.error('--temperatures needs --output-format npy')
+    if args.profile is not None and args.temperatures is not None:
+        parser.error('--profile and --temperatures cannot be combined')
+    if args.cross_section is not None:
+        if args.profile is None:
+            parser.error('--cross-section needs --profile')
+        if args.output_format != 'par' or args.incremental:
+            parser.error('--cross-section writes a .npz file; leave out --output-format and --incremental')
+        if args.nu_min is not None or args.nu_max is not None:
+            parser.error('--cross-section reads the lines of its grid; leave out --nu-min and --nu-max')
+    elif args.profile is not None and args.output_format != 'npy':
+        parser.error('--profile needs --output-format npy or --cross-section')
+    elif args.workers is not None and args.workers > 1:
+        if args.output_format != 'par' or args.incremental:
+            parser.error('--workers needs .par output without --incremental')
+        if args.nu_min is not None or args.nu_max is not None:
+            parser.error('--workers broadens whole files; leave out --nu-min and --nu-max')
+        if args.overlap_io:
+            parser.error('--overlap-io is for single-process runs; leave out --workers')
+    if args.nu_min is not None and args.nu_max is not None and args.nu_min > args.nu_max:
+        parser.error('--nu-min must not be larger than --nu-max')
+    if args.wing_cutoff is not None and args.wing_cutoff <= 0:
+        parser.error('--wing-cutoff must be positive')
+    if args.workers is not None and args.workers < 1:
+        parser.error('--workers must be at least 1')
+
+    if args.readpath is None:
+        args.readpath = input(prompt)
+    if args.savepath is None:
+        args.savepath = input('output file name:')
+    return args
+
+def run(args, columns, broaden, fmt):
+    '''Broaden args.readpath into args.savepath with the options given on the command line.'''
+    started = time.perf_counter()
+    if args.cross_section is not None:
+        nlines = cross_section_file(args.readpath, args.savepath, columns, broaden, args.profile,
+                                    args.cross_section, wing_cutoff=args.wing_cutoff,
+                                    workers=args.workers, chunk_lines=args.chunk_lines)
+    else:
+        nlines = broaden_file(args.readpath, args.savepath, columns, broaden, fmt,
+                              chunk_lines=args.chunk_lines, output_format=args.output_format,
+                              compress_workers=args.compress_workers,
+                              nu_min=args.nu_min, nu_max=args.nu_max,
+                              incremental=args.incremental, temperatures=args.temperatures,
+                              profile=args.profile, workers=args.workers,
+                              overlap=args.overlap_io)
+    if args.timing:
+        print('%s: %d lines in %.3f s' % (args.readpath, nlines, time.perf_counter() - started),
+              file=sys.stderr)
+    return nlines
@@ -0,0 +1,333 @@
+# -*- coding: utf-8 -*-
+'''
+Coefficients of the broadening models, read from one data file per molecule.
+
+The models of a molecule are given in coefficients/MOLECULE.json (next to
+the scripts), e.g.
+
+    {"format": 1, "molecule": "CO", "version": "2022.1",
+     "He": {"gamma": {"input": "m",
+                      "model": {"form": "pade", "coefficients": [a0, a1, a2, a3, b1, b2, b3, b4]},
+                      "err": {"thresholds": [101, 121], "codes": [5, 4, 3], "inclusive": true},
+                      "ref": "1345", "source": "..."},
+            "n": {...}, "delta": {...}},
+     "H2": {...}, ...}
+
+Each broadener has its parameters gamma, n and delta, in the order of the
+output columns. A parameter is either a fit of one or more inputs (INPUTS)
+or a fixed "value", given as the text written to the output. The forms of
+the fits are
+
+    pade        the eight coefficients of broadeners.pade
+    polynomial  "terms" [c, p1, p2, ...]: the sum of c * x1**p1 * x2**p2 ...
+    piecewise   "pieces" [{"upto": x0, "model": ...}, ..., {"model": ...}]:
+                the first piece with x <= upto, the last one above them all
+    constant    a "value"
+    shift       the "rot", "vib" and "multiplier" of broadeners.shifts
+
+Before a fit is evaluated its inputs are mapped: "set" gives ranges
+[lo, hi, value] whose inputs are replaced by value (the first range that
+matches; null is an open end) and "clip" gives bounds [lo, hi] (null for
+none). A fit of several inputs gives one set and clip entry per input.
+"err" is an uncertainty code ladder (broadeners.uncertainty) of the first
+input before the mapping, or a fixed code; "ref" is the HITRAN global
+reference ID of the parameter and "source" describes its data.
+
+load_plan() compiles the fits into lookup tables over the integer keys of
+their inputs (broadeners.tables), one table per set of inputs, so that
+Plan.evaluate() looks up all parameters of a chunk of lines with one indexed
+load per input. The tables are cached in coefficients/__pycache__ under the
+SHA-256 of the data file: the fits are only evaluated again when the file
+changes, and a new release of the coefficients only needs new data files.
+'''
+
+import glob
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from broadeners.pade import pade
+from broadeners.shifts import shift_table
+from broadeners.tables import compile_table, lookup
+from broadeners.uncertainty import err_code
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'coefficients')
+CACHE_DIR = os.path.join(DATA_DIR, '__pycache__')
+
+FORMAT = 1         # layout of the data files read by this module
+PLAN_VERSION = 1   # layout of the compiled tables, part of the name of the cache files
+
+PARAMETERS = ('gamma', 'n', 'delta')
+
+def _same(key):
+    return key
+
+def _fifth(key):
+    return key / 5.0 # J+0.2Ka of the key 5J+Ka
+
+# input: (number of integer keys, input of the keys)
+INPUTS = {'m': (1001, _same),       # |m| = J"+1 is at most 1000, J" having three characters in the .par record
+          'jka': (595, _fifth),     # J+0.2Ka of the key 5J+Ka; J and Ka have two characters each
+          'J_low': (100, _same),    # J" of two characters (PH3)
+          'Ka_upp': (100, _same)}   # Ka' of two characters (PH3)
+
+_PLANS = {}
+
+def column_names(broadener, parameter):
+    '''Return the names of the value, uncertainty code and reference columns of a parameter.'''
+    # gamma_He, err_He, ref_He; n_He, err_n_He, ref_n_He; delta_He, err_delta_He, ref_delta_He
+    prefix = '' if parameter == 'gamma' else parameter + '_'
+    return parameter + '_' + broadener, 'err_' + prefix + broadener, 'ref_' + prefix + broadener
+
+#--------------data files-------------------------------
+
+def data_path(molecule):
+    '''Return the name of the data file of a molecule.'''
+    return os.path.join(DATA_DIR, molecule + '.json')
+
+def read_coefficients(path):
+    '''Return the contents of a data file, with the SHA-256 of the file as 'sha256'.'''
+    with open(path, 'rb') as f:
+        data = f.read()
+    coefficients = json.loads(data.decode('utf-8'))
+    if coefficients.get('format') != FORMAT:
+        raise ValueError('%s: coefficient file format %r, expected %d'
+                         % (path, coefficients.get('format'), FORMAT))
+    coefficients['sha256'] = hashlib.sha256(data).hexdigest()
+    return coefficients
+
+def entries(coefficients):
+    '''Return the (broadener, parameter, entry) of the parameters in a data file, in its order.'''
+    return [(broadener, parameter, entry)
+            for broadener, models in coefficients.items() if isinstance(models, dict)
+            for parameter, entry in models.items() if parameter in PARAMETERS]
+
+def _inputs(entry):
+    names = entry['input']
+    names = [names] if isinstance(names, str) else list(names)
+    unknown = [name for name in names if name not in INPUTS]
+    if unknown:
+        raise ValueError('unknown input(s) %s; known inputs: %s' % (', '.join(unknown), ', '.join(INPUTS)))
+    return names
+
+def _fitted(coefficients):
+    # the fits of gamma and n, by their inputs ('m', 'm,Ka_upp', ...)
+    groups = {}
+    for broadener, parameter, entry in entries(coefficients):
+        if 'model' in entry and entry['model'].get('form') != 'shift':
+            groups.setdefault(','.join(_inputs(entry)), []).append((broadener, parameter, entry))
+    return groups
+
+#--------------evaluation of the fits-------------------------------
+
+def _polynomial(terms, x):
+    # each product is taken left to right, and the terms are summed in their order
+    total = 0.0
+    for term in terms:
+        if len(term) != len(x) + 1:
+            raise ValueError('polynomial term %r of %d input(s)' % (term, len(x)))
+        value = term[0]
+        for xi, power in zip(x, term[1:]):
+            for _ in range(power):
+                value = value * xi
+        total = total + value
+    return np.array(np.broadcast_to(total, np.shape(x[0])), dtype=np.float64)
+
+def evaluate(model, *x):
+    '''Return the fit model (the "model" of a parameter) at the inputs x.'''
+    form = model.get('form')
+    if form == 'pade':
+        return pade(x[0], model['coefficients'])
+    if form == 'polynomial':
+        return _polynomial(model['terms'], x)
+    if form == 'piecewise':
+        pieces = model['pieces']
+        result = evaluate(pieces[-1]['model'], *x)
+        for piece in pieces[-2::-1]:
+            result = np.where(x[0] <= piece['upto'], evaluate(piece['model'], *x), result)
+        return result
+    if form == 'constant':
+        return np.full(np.shape(x[0]), model['value'], dtype=np.float64)
+    raise ValueError('unknown model form %r' % (form,))
+
+def map_input(x, ranges=None, bounds=None):
+    '''Return x with the values in the ranges [lo, hi, value] replaced, then clipped to bounds [lo, hi].'''
+    if ranges:
+        conditions = []
+        for lo, hi, value in ranges:
+            inside = np.ones(np.shape(x), dtype=bool)
+            if lo is not None:
+                inside &= x >= lo
+            if hi is not None:
+                inside &= x <= hi
+            conditions.append(inside)
+        x = np.select(conditions, [value for lo, hi, value in ranges], x)
+    if bounds is not None and any(bound is not None for bound in bounds):
+        x = np.clip(x, *bounds)
+    return x
+
+def fit_inputs(entry, keys):
+    '''Return the inputs of a fitted parameter for the integer keys of its inputs, mapped by its set and clip rules.'''
+    names = _inputs(entry)
+    ranges, bounds = entry.get('set'), entry.get('clip')
+    if len(names) == 1:
+        ranges, bounds = [ranges], [bounds]
+    ranges = ranges or [None] * len(names)
+    bounds = bounds or [None] * len(names)
+    return [map_input(INPUTS[name][1](key), r, b) for name, key, r, b in zip(names, keys, ranges, bounds)]
+
+#--------------compiled tables-------------------------------
+
+def _table_shapes(coefficients):
+    # name and key shape of every table of a plan
+    shapes = {}
+    for inputs, fits in _fitted(coefficients).items():
+        sizes = tuple(INPUTS[name][0] for name in inputs.split(','))
+        shapes['values-' + inputs] = sizes
+        if any(isinstance(entry['err'], dict) for broadener, parameter, entry in fits):
+            shapes['codes-' + inputs] = sizes
+    for broadener, parameter, entry in entries(coefficients):
+        if entry.get('model', {}).get('form') == 'shift':
+            shapes['shift-' + broadener] = (INPUTS[_inputs(entry)[0]][0],)
+    return shapes
+
+def compile_tables(coefficients):
+    '''Evaluate the fits of a data file for all keys of their inputs and return the tables by name.'''
+    tables = {}
+    for inputs, fits in _fitted(coefficients).items():
+        sizes = [INPUTS[name][0] for name in inputs.split(',')]
+        tables['values-' + inputs] = compile_table(
+            lambda *keys: [evaluate(entry['model'], *fit_inputs(entry, keys))
+                           for broadener, parameter, entry in fits], *sizes)
+        ladders = [entry['err'] for broadener, parameter, entry in fits if isinstance(entry['err'], dict)]
+        if ladders:
+            # the codes are those of the input before it is mapped
+            tables['codes-' + inputs] = compile_table(
+                lambda *keys: [err_code(INPUTS[inputs.split(',')[0]][1](keys[0]), ladder)
+                               for ladder in ladders], *sizes)
+    for broadener, parameter, entry in entries(coefficients):
+        if entry.get('model', {}).get('form') == 'shift':
+            tables['shift-' + broadener] = shift_table(entry['model'], INPUTS[_inputs(entry)[0]][0])
+    return tables
+
+def cache_path(coefficients):
+    '''Return the name of the cache file of the compiled tables of a data file.'''
+    return os.path.join(CACHE_DIR, '%s-%d-%s.npz' % (coefficients['molecule'], PLAN_VERSION,
+                                                     coefficients['sha256']))
+
+def _read_cache(coefficients):
+    path = cache_path(coefficients)
+    if not os.path.exists(path):
+        return None
+    try:
+        with np.load(path) as data:
+            tables = {name: data[name] for name in data.files}
+    except Exception:
+        return None # an unreadable cache file is compiled again
+    for name, sizes in _table_shapes(coefficients).items():
+        if name not in tables or tables[name].shape[tables[name].ndim - len(sizes):] != sizes:
+            return None
+    return tables
+
+def _write_cache(coefficients, tables):
+    path = cache_path(coefficients)
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp = '%s.%d.tmp' % (path, os.getpid())
+        with open(tmp, 'wb') as f:
+            np.savez(f, **tables)
+        os.replace(tmp, path)
+        # the tables of older versions of the file are not needed anymore
+        for old in glob.glob(os.path.join(CACHE_DIR, '%s-*.npz' % coefficients['molecule'])):
+            if old != path:
+                os.remove(old)
+    except OSError:
+        pass # e.g. a read-only installation; the tables are compiled on every start
+
+#--------------plans-------------------------------
+
+class Plan(object):
+    '''
+    The coefficients of a molecule compiled into lookup tables; evaluate()
+    returns the columns of its gamma and n parameters for a chunk of lines.
+    '''
+
+    def __init__(self, coefficients, tables):
+        self.coefficients = coefficients
+        self.molecule = coefficients['molecule']
+        self.version = coefficients.get('version')
+        self.sha256 = coefficients['sha256']
+        self.tables = tables
+        self._fitted = _fitted(coefficients)
+
+    def parameter(self, broadener, parameter):
+        '''Return the entry of a parameter in the data file.'''
+        entry = self.coefficients.get(broadener)
+        if not isinstance(entry, dict) or parameter not in entry:
+            raise ValueError('no %s %s model for %s' % (broadener, parameter, self.molecule))
+        return entry[parameter]
+
+    def shift_table(self, broadener):
+        '''Return the table of the shift terms of a broadener (see broadeners.shifts).'''
+        self.parameter(broadener, 'delta')
+        return self.tables['shift-' + broadener]
+
+    def evaluate(self, parameters=('gamma', 'n'), **keys):
+        '''
+        Return {column: values} with the value, uncertainty code and reference
+        of the parameters for lines with the integer keys of the inputs
+        (e.g. m=...), in the order of the data file. The shifts also depend
+        on the branch and vibrational quanta of a line; see shift_table().
+        '''
+        if not keys:
+            raise ValueError('no input keys given')
+        nlines = len(next(iter(keys.values())))
+        looked_up = {}
+        for inputs, fits in self._fitted.items():
+            if not any(parameter in parameters for broadener, parameter, entry in fits):
+                continue
+            names = inputs.split(',')
+            missing = [name for name in names if name not in keys]
+            if missing:
+                raise ValueError('%s models need the input(s) %s' % (self.molecule, ', '.join(missing)))
+            columns = [keys[name] for name in names]
+            values = lookup(self.tables['values-' + inputs], *columns)
+            codes = iter(lookup(self.tables['codes-' + inputs], *columns)
+                         if 'codes-' + inputs in self.tables else ())
+            for (broadener, parameter, entry), value in zip(fits, values):
+                code = next(codes) if isinstance(entry['err'], dict) else None
+                looked_up[broadener, parameter] = value, code
+
+        result = {}
+        for broadener, parameter, entry in entries(self.coefficients):
+            if parameter not in parameters:
+                continue
+            value, err, ref = column_names(broadener, parameter)
+            if (broadener, parameter) in looked_up:
+                result[value], code = looked_up[broadener, parameter]
+            elif 'value' in entry:
+                result[value], code = [entry['value']] * nlines, None
+            else:
+                raise ValueError('the %s %s model of %s is not a lookup; see shift_table()'
+                                 % (broadener, parameter, self.molecule))
+            result[err] = code if code is not None else [str(entry['err'])] * nlines
+            result[ref] = [entry['ref']] * nlines
+        return result
+
+def load_plan(molecule, cache=True):
+    '''
+    Return the Plan of the data file of a molecule; with cache=True the
+    compiled tables are read from, or saved to, the cache.
+    '''
+    coefficients = read_coefficients(data_path(molecule))
+    key = (molecule, coefficients['sha256'])
+    if key not in _PLANS:
+        tables = _read_cache(coefficients) if cache else None
+        if tables is None:
+            tables = compile_tables(coefficients)
+            if cache:
+                _write_cache(coefficients, tables)
+        _PLANS[key] = Plan(coefficients, tables)
+    return _PLANS[key]
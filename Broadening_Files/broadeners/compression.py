@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+'''
+Transparent compressed input and output.
+
+Whether a file is compressed is decided by its extension: .gz, .bz2 and .xz
+files are decompressed while they are read, and an output name ending in one
+of these is compressed while it is written. gzip output is produced as a
+series of independent gzip members, each compressing one block of the
+output, and the blocks are compressed on a pool of threads (zlib releases
+the GIL) so compression keeps up with the broadening. Any gzip reader,
+including gunzip and Python's gzip module, reads multi-member files as one
+stream.
+
+The compression modules are only imported when a compressed file is opened,
+so plain .par files do not pay for them at startup.
+'''
+
+import importlib
+import os
+from collections import deque
+
+# extension: module whose open() reads and writes the format
+OPENERS = {'.gz': 'gzip', '.bz2': 'bz2', '.xz': 'lzma'}
+
+GZIP_BLOCK_SIZE = 4 * 1024**2   # uncompressed bytes per gzip member
+GZIP_LEVEL = 6
+
+def compression(path):
+    '''Return the compression extension of path ('.gz', '.bz2', '.xz') or None.'''
+    ext = os.path.splitext(str(path))[1].lower()
+    return ext if ext in OPENERS else None
+
+def _opener(ext):
+    return importlib.import_module(OPENERS[ext]).open
+
+def open_input(readpath):
+    '''Open readpath for binary reading, decompressing it if needed.'''
+    ext = compression(readpath)
+    if ext is None:
+        return open(readpath, 'rb')
+    return _opener(ext)(readpath, 'rb')
+
+#--------------parallel gzip writer-------------------------------
+
+class ParallelGzipWriter(object):
+    '''
+    Binary file object that writes a multi-member gzip file, compressing
+    blocks of block_size bytes on workers threads. The members are written in
+    order, and at most two blocks per worker are waiting at any time.
+    '''
+
+    def __init__(self, savepath, workers=None, block_size=GZIP_BLOCK_SIZE, level=GZIP_LEVEL):
+        from concurrent.futures import ThreadPoolExecutor
+        self.workers = workers or os.cpu_count() or 1
+        self.block_size = block_size
+        self.level = level
+        self._file = open(savepath, 'wb')
+        self._pool = ThreadPoolExecutor(self.workers)
+        self._pending = deque()
+        self._buffer = bytearray()
+
+    def _compress(self, block):
+        # mtime=0 keeps the output reproducible
+        import gzip
+        return gzip.compress(block, self.level, mtime=0)
+
+    def _submit(self, block):
+        self._pending.append(self._pool.submit(self._compress, block))
+        while len(self._pending) > 2 * self.workers:
+            self._file.write(self._pending.popleft().result())
+
+    def write(self, data):
+        self._buffer += data
+        if len(self._buffer) >= self.block_size:
+            view = memoryview(self._buffer)
+            nblocks = len(self._buffer) // self.block_size
+            for k in range(nblocks):
+                self._submit(bytes(view[k * self.block_size:(k + 1) * self.block_size]))
+            view.release()
+            del self._buffer[:nblocks * self.block_size]
+        return len(data)
+
+    def close(self):
+        if self._file.closed:
+            return
+        try:
+            if self._buffer:
+                self._submit(bytes(self._buffer))
+                self._buffer = bytearray()
+            while self._pending:
+                self._file.write(self._pending.popleft().result())
+        finally:
+            self._pool.shutdown()
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def open_output(savepath, workers=None):
+    '''
+    Open savepath for binary writing, compressing it if its extension asks for
+    it. gzip output is compressed in parallel on workers threads.
+    '''
+    ext = compression(savepath)
+    if ext is None:
+        return open(savepath, 'wb')
+    if ext == '.gz':
+        return ParallelGzipWriter(savepath, workers=workers)
+    return _opener(ext)(savepath, 'wb')
@@ -0,0 +1,240 @@
+# -*- coding: utf-8 -*-
+'''
+Incremental re-broadening of an updated line list.
+
+When a .par output is written with incremental=True, a sidecar file
+OUTPUT.par.digest is saved next to it. It holds a 128-bit digest of the 160
+characters of every input record, the byte offset of every output line and a
+stamp of the broadening model (the sources of the script, of the scripts it
+imports and of the broadeners modules that evaluate it, its coefficient data
+files, its column specification and its output format). On the next
+incremental run into the same output, every record whose digest is found in the sidecar is copied from the
+previous output unchanged, and only new or changed records are broadened.
+Runs of unchanged records are copied as single blocks, so apart from
+hashing the input (a few vectorized passes) the work done scales with the
+number of changed lines, not with the size of the list.
+
+The previous output and its sidecar are only used if the output file has
+not been touched since the sidecar was written and the model stamp still
+matches; otherwise the whole list is broadened again. The new output is
+written to OUTPUT.par.tmp and moved over the old one when it is complete.
+'''
+
+import hashlib
+import importlib
+import inspect
+import json
+import os
+
+import numpy as np
+
+from broadeners.compression import compression
+from broadeners.parfile import PAR_WIDTH
+from broadeners.writer import write_chunk
+
+DIGEST_SUFFIX = '.digest'
+DIGEST_VERSION = 1
+
+# two independent 64-bit multiply/xorshift lanes over the 8-byte words of a
+# record; a single 64-bit digest would be expected to collide somewhere in a
+# list of a few billion lines
+_LANES = ((0x243F6A8885A308D3, 0x9E3779B97F4A7C15, 31),
+          (0x13198A2E03707344, 0xC2B2AE3D27D4EB4F, 29))
+
+def digest_path(savepath):
+    '''Return the name of the digest sidecar of the output savepath.'''
+    return str(savepath) + DIGEST_SUFFIX
+
+#--------------record digests-------------------------------
+
+def _finish(h):
+    # final avalanche (MurmurHash3 fmix64)
+    h ^= h >> np.uint64(33)
+    h *= np.uint64(0xFF51AFD7ED558CCD)
+    h ^= h >> np.uint64(33)
+    h *= np.uint64(0xC4CEB9FE1A85EC53)
+    h ^= h >> np.uint64(33)
+    return h
+
+def record_digests(records):
+    '''Return an (n, 2) uint64 array with a digest of the 160 characters of every record.'''
+    width = -(-PAR_WIDTH // 8) * 8
+    text = np.zeros((len(records), width), dtype=np.uint8)
+    text[:, :PAR_WIDTH] = records[:, :PAR_WIDTH]
+    words = np.ascontiguousarray(text.view('<u8').astype(np.uint64).T)
+
+    digests = np.empty((len(records), 2), dtype=np.uint64)
+    for lane, (seed, multiplier, shift) in enumerate(_LANES):
+        h = np.full(len(records), seed, dtype=np.uint64)
+        for word in (words if lane == 0 else words[::-1]):
+            h ^= word
+            h *= np.uint64(multiplier)
+            h ^= h >> np.uint64(shift)
+        digests[:, lane] = _finish(h)
+    return digests
+
+def _coefficient_digests(broaden):
+    # the SHA-256 of the coefficient data files of the PLAN of the script of
+    # broaden() and of the scripts it uses (CO_with_shifts.py uses CO.py, ...)
+    namespace = getattr(broaden, '__globals__', {})
+    plans = [namespace.get('PLAN')] + [getattr(value, 'PLAN', None) for value in namespace.values()
+                                       if inspect.ismodule(value)]
+    return sorted(set(plan.sha256 for plan in plans if plan is not None))
+
+# the broadeners modules that read, evaluate and format the model; a change to
+# any of them changes the stamp
+MODEL_MODULES = ('broadeners.parfile', 'broadeners.quanta', 'broadeners.tables',
+                 'broadeners.shifts', 'broadeners.pade', 'broadeners.uncertainty',
+                 'broadeners.coefficients', 'broadeners.writer')
+
+def _script_sources(broaden):
+    # the source file of broaden() and of the scripts next to it that it
+    # imports, recursively (CO_with_shifts.py uses CO.py, CO_He_shifts.py, ...)
+    try:
+        path = inspect.getsourcefile(broaden)
+    except TypeError:
+        return []
+    if path is None:
+        return []
+    folder = os.path.dirname(os.path.abspath(path))
+    sources, pending = [], [(path, getattr(broaden, '__globals__', {}))]
+    while pending:
+        path, namespace = pending.pop()
+        if path in sources:
+            continue
+        sources.append(path)
+        for value in list(namespace.values()):
+            source = getattr(value, '__file__', None) if inspect.ismodule(value) else None
+            if source and os.path.dirname(os.path.abspath(source)) == folder:
+                pending.append((source, vars(value)))
+    return sorted(sources)
+
+def model_stamp(columns, broaden, fmt):
+    '''
+    Return a stamp of the broadening model: the source files of broaden() and
+    of the scripts it imports, the broadeners modules in MODEL_MODULES, the
+    coefficient data files it uses (see broadeners.coefficients), the column
+    specification and the format.
+    '''
+    h = hashlib.sha256()
+    for digest in _coefficient_digests(broaden):
+        h.update(digest.encode('ascii'))
+    h.update(fmt.encode('utf-8'))
+    h.update(json.dumps({k: list(v) for k, v in columns.items()}, sort_keys=True).encode('utf-8'))
+    sources = _script_sources(broaden)
+    if not sources:
+        h.update(broaden.__code__.co_code)
+    for name in MODEL_MODULES:
+        sources.append(inspect.getsourcefile(importlib.import_module(name)))
+    for path in sources:
+        try:
+            with open(path, 'rb') as f:
+                h.update(f.read())
+        except OSError:
+            h.update(path.encode('utf-8'))
+    return h.hexdigest()
+
+#--------------digest sidecar-------------------------------
+
+def _output_stamp(savepath):
+    stat = os.stat(savepath)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+def save_digests(savepath, digests, offsets, stamp):
+    '''Write the digest sidecar of the finished output savepath.'''
+    meta = {'version': DIGEST_VERSION, 'model': stamp, 'lines': len(digests),
+            'output': _output_stamp(savepath)}
+    with open(digest_path(savepath), 'wb') as f:
+        np.savez(f, digests=digests, offsets=offsets, meta=np.array(json.dumps(meta)))
+
+def load_digests(savepath, stamp):
+    '''
+    Return (digests, offsets) of the previous output savepath, or None if there
+    is no usable sidecar (missing, other model, or output changed since).
+    '''
+    path = digest_path(savepath)
+    if not (os.path.exists(path) and os.path.exists(savepath)):
+        return None
+    with np.load(path) as sidecar:
+        meta = json.loads(str(sidecar['meta']))
+        digests = sidecar['digests']
+        offsets = sidecar['offsets']
+    if (meta.get('version') != DIGEST_VERSION or meta.get('model') != stamp
+            or meta.get('output') != _output_stamp(savepath)):
+        return None
+    return digests, offsets
+
+#--------------incremental output-------------------------------
+
+def _runs(previous):
+    '''
+    Split a chunk into runs of records that are either all new (previous < 0)
+    or copied from consecutive lines of the previous output.
+    Returns (starts, stops).
+    '''
+    reused = previous >= 0
+    breaks = np.flatnonzero((reused[1:] != reused[:-1])
+                            | (reused[1:] & (previous[1:] != previous[:-1] + 1))) + 1
+    return np.r_[0, breaks], np.r_[breaks, len(previous)]
+
+def write_incremental(chunks, savepath, columns, broaden, fmt):
+    '''
+    Write the .par output savepath for the (record numbers, records) chunks,
+    reusing the lines of the previous output of the same model where the input
+    record is unchanged, and save the digest sidecar for the next run.
+    Returns (lines written, lines reused).
+    '''
+    if compression(savepath) is not None:
+        raise ValueError('incremental output must be an uncompressed .par file: %s' % savepath)
+    stamp = model_stamp(columns, broaden, fmt)
+    previous = load_digests(savepath, stamp)
+    if previous is not None:
+        old_digests, old_offsets = previous
+        # look up by the first lane, then check the second
+        order = np.argsort(old_digests[:, 0], kind='stable')
+        old_keys = old_digests[order]
+        old_first = np.ascontiguousarray(old_keys[:, 0])
+        old_lines = (np.memmap(savepath, dtype=np.uint8, mode='r') if old_offsets[-1]
+                     else np.zeros(0, dtype=np.uint8))
+
+    tmppath = str(savepath) + '.tmp'
+    digests, lengths = [], []
+    nlines = nreused = 0
+    cache = {}
+    with open(tmppath, 'wb') as out:
+        for numbers, records in chunks:
+            if len(records) == 0:
+                continue
+            digest = record_digests(records)
+            old = np.full(len(records), -1, dtype=np.int64)
+            if previous is not None and len(old_keys):
+                # sorted needles keep the binary searches cache friendly
+                needles = np.argsort(digest[:, 0])
+                pos = np.empty(len(records), dtype=np.int64)
+                pos[needles] = np.searchsorted(old_first, digest[needles, 0])
+                np.minimum(pos, len(old_keys) - 1, out=pos)
+                found = (old_keys[pos] == digest).all(axis=1)
+                old[found] = order[pos[found]]
+
+            for start, stop in zip(*_runs(old)):
+                if old[start] >= 0:
+                    first, last = old[start], old[stop - 1] + 1
+                    out.write(old_lines[old_offsets[first]:old_offsets[last]])
+                    lengths.append(np.diff(old_offsets[first:last + 1]))
+                    nreused += int(stop - start)
+                else:
+                    lengths.append(write_chunk(out, records[start:stop], columns, broaden,
+                                               fmt, cache))
+            digests.append(digest)
+            nlines += len(records)
+
+    if previous is not None:
+        del old_lines   # release the mapping before the file is replaced
+    os.replace(tmppath, savepath)
+
+    digests = np.concatenate(digests) if digests else np.zeros((0, 2), dtype=np.uint64)
+    offsets = np.zeros(nlines + 1, dtype=np.int64)
+    if lengths:
+        np.cumsum(np.concatenate(lengths), out=offsets[1:])
+    save_digests(savepath, digests, offsets, stamp)
+    return nlines, nreused
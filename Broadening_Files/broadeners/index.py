@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+'''
+Wavenumber sidecar index for .par files.
+
+build_index() makes one pass over a .par file and writes FILE.par.idx next
+to it. For every block of BLOCK_LINES records the index holds the number of
+the first record, its byte offset in the file and the smallest and largest
+wavenumber nu (characters 3-14 of the record) in the block. A spectral window
+nu_min..nu_max can then be read by going straight to the blocks that overlap
+it, instead of parsing the whole file; HITRAN files are sorted by nu, so for a
+narrow window that is a handful of blocks.
+
+The index also records the size and modification time of the .par file and
+is ignored once the file has changed. To index files from the command line:
+
+    python -m broadeners.index sample_CO.par [more.par ...]
+'''
+
+import json
+import os
+import sys
+
+import numpy as np
+
+from broadeners.compression import compression
+from broadeners.parfile import NU_COLUMN, iter_records, open_records, parse_column
+
+INDEX_SUFFIX = '.idx'
+INDEX_VERSION = 1
+BLOCK_LINES = 1024
+
+BLOCK_DTYPE = np.dtype([('record', np.int64), ('offset', np.int64),
+                        ('nu_min', np.float64), ('nu_max', np.float64)])
+
+def index_path(readpath):
+    '''Return the name of the sidecar index of readpath.'''
+    return str(readpath) + INDEX_SUFFIX
+
+def _source_stamp(readpath):
+    stat = os.stat(readpath)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+#--------------build and load the index-------------------------------
+
+def build_index(readpath, block_lines=BLOCK_LINES, chunk_lines=BLOCK_LINES * 256):
+    '''Write the sidecar index of the (uncompressed) .par file readpath and return its path.'''
+    if compression(readpath) is not None:
+        raise ValueError('cannot index compressed file %s: it cannot be read from an offset' % readpath)
+    records = open_records(readpath, mmap=True)
+    record_length = records.shape[1] + 1
+    chunk_lines = -(-chunk_lines // block_lines) * block_lines   # whole blocks
+
+    blocks = []
+    for start in range(0, len(records), chunk_lines):
+        nu = parse_column(records[start:start + chunk_lines], *NU_COLUMN).astype(np.float64)
+        nblocks = -(-len(nu) // block_lines)
+        padded = np.full(nblocks * block_lines, np.nan)
+        padded[:len(nu)] = nu
+        padded = padded.reshape(nblocks, block_lines)
+        block = np.zeros(nblocks, dtype=BLOCK_DTYPE)
+        block['record'] = start + np.arange(nblocks) * block_lines
+        block['offset'] = block['record'] * record_length
+        block['nu_min'] = np.nanmin(padded, axis=1)
+        block['nu_max'] = np.nanmax(padded, axis=1)
+        blocks.append(block)
+    blocks = np.concatenate(blocks) if blocks else np.zeros(0, dtype=BLOCK_DTYPE)
+
+    meta = {'version': INDEX_VERSION, 'lines': len(records), 'record_length': record_length,
+            'block_lines': block_lines, 'source': _source_stamp(readpath)}
+    savepath = index_path(readpath)
+    with open(savepath, 'wb') as f:
+        np.savez(f, blocks=blocks, meta=np.array(json.dumps(meta)))
+    return savepath
+
+def load_index(readpath):
+    '''
+    Return (meta, blocks) of the sidecar index of readpath, or None if there is
+    no index or the .par file has changed since it was built.
+    '''
+    path = index_path(readpath)
+    if compression(readpath) is not None or not os.path.exists(path):
+        return None
+    with np.load(path) as index:
+        meta = json.loads(str(index['meta']))
+        blocks = index['blocks']
+    if meta.get('version') != INDEX_VERSION or meta.get('source') != _source_stamp(readpath):
+        return None
+    return meta, blocks
+
+#--------------read a spectral window-------------------------------
+
+def _in_window(records, lo, hi):
+    nu = parse_column(records, *NU_COLUMN)
+    return np.flatnonzero((nu >= lo) & (nu <= hi))
+
+def iter_window(readpath, nu_min=None, nu_max=None, chunk_lines=BLOCK_LINES * 256):
+    '''
+    Yield (record numbers, records) for the lines of readpath with
+    nu_min <= nu <= nu_max, in file order and in chunks of at most about
+    chunk_lines lines. The sidecar index is used when there is an up-to-date
+    one; otherwise the whole file is scanned.
+    '''
+    lo = -np.inf if nu_min is None else nu_min
+    hi = np.inf if nu_max is None else nu_max
+    if lo > hi:
+        raise ValueError('empty wavenumber window: nu_min %g > nu_max %g' % (lo, hi))
+    index = load_index(readpath)
+
+    if index is None:
+        first = 0
+        for records in iter_records(readpath, chunk_lines):
+            keep = _in_window(records, lo, hi)
+            if len(keep):
+                yield first + keep, records[keep]
+            first += len(records)
+        return
+
+    meta, blocks = index
+    records = open_records(readpath, mmap=True)
+    block_lines = meta['block_lines']
+    selected = np.flatnonzero((blocks['nu_max'] >= lo) & (blocks['nu_min'] <= hi))
+
+    # read runs of consecutive selected blocks, at most chunk_lines records at a time
+    step = max(1, chunk_lines // block_lines)
+    runs = np.split(selected, np.flatnonzero(np.diff(selected) != 1) + 1) if len(selected) else []
+    for run in runs:
+        for k in range(0, len(run), step):
+            start = int(blocks['record'][run[k]])
+            stop = min(int(blocks['record'][run[min(k + step, len(run)) - 1]]) + block_lines,
+                       len(records))
+            keep = _in_window(records[start:stop], lo, hi)
+            if len(keep):
+                yield start + keep, records[start:stop][keep]
+
+#--------------command line-------------------------------
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        sys.exit('usage: python -m broadeners.index FILE.par [FILE.par ...]')
+    for readpath in sys.argv[1:]:
+        print('wrote', build_index(readpath))
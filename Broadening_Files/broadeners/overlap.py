@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+'''
+Overlapping the reading and writing of a file with the broadening.
+
+With overlap=True (--overlap-io on the command line) the chunks of the input
+are read by a reader thread and the output is written by a writer thread,
+connected to the broadening in the main thread by queues of at most depth
+chunks each. While one chunk is broadened, the next one is read and the
+previous one written, so on slow (e.g. network-mounted) storage the time
+spent waiting on the disk is hidden behind the NumPy work, which releases
+the GIL for most of its time. The output is the same as without overlap.
+
+Memory-mapped input is only read from disk when its pages are touched, so
+the reader thread copies every chunk into memory. An error in either thread
+is raised again in the main thread.
+'''
+
+import queue
+import threading
+
+import numpy as np
+
+DEFAULT_DEPTH = 2   # chunks waiting in each queue
+
+_DONE = object()
+
+def _put(q, item, stop):
+    # put item on q unless the consumer has gone away
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+def prefetch_chunks(chunks, depth=DEFAULT_DEPTH):
+    '''
+    Yield the (record numbers, records) of chunks, reading up to depth chunks
+    ahead on a background thread.
+    '''
+    q = queue.Queue(depth)
+    stop = threading.Event()
+
+    def read():
+        try:
+            for numbers, records in chunks:
+                # copy the records so the reader thread, not the consumer, waits for the disk
+                if not _put(q, (numbers, np.array(records)), stop):
+                    return
+        except BaseException as error:
+            _put(q, error, stop)
+        else:
+            _put(q, _DONE, stop)
+
+    reader = threading.Thread(target=read, name='broadeners-reader', daemon=True)
+    reader.start()
+    try:
+        while True:
+            item = q.get()
+            if item is _DONE:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        reader.join()
+
+class BackgroundWriter(object):
+    '''
+    Binary file object that passes its writes to a writer thread, which
+    writes them to out in order; at most depth writes are waiting.
+    '''
+
+    def __init__(self, out, depth=DEFAULT_DEPTH):
+        self._out = out
+        self._queue = queue.Queue(depth)
+        self._stop = threading.Event()
+        self._error = None
+        self._thread = threading.Thread(target=self._write, name='broadeners-writer', daemon=True)
+        self._thread.start()
+
+    def _write(self):
+        while True:
+            data = self._queue.get()
+            if data is _DONE:
+                return
+            if self._error is None:
+                try:
+                    self._out.write(data)
+                except BaseException as error:
+                    self._error = error
+                    self._stop.set()
+
+    def _check(self):
+        if self._error is not None:
+            raise self._error
+
+    def write(self, data):
+        self._check()
+        data = bytes(data)
+        _put(self._queue, data, self._stop)
+        self._check()
+        return len(data)
+
+    def close(self):
+        '''Wait until everything is written; raise the error of the writer thread, if any.'''
+        if self._thread.is_alive():
+            self._queue.put(_DONE)
+            self._thread.join()
+        self._check()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+'''
+Vectorized Padé approximant shared by the broadening scripts.
+
+The gamma and n fits of Tan et al. 2022 are 3rd-to-4th order Padé
+approximants of the rotational running index |m| (or J+0.2Ka)
+
+    (a0 + a1*x + a2*x**2 + a3*x**3) / (1 + b1*x + b2*x**2 + b3*x**3 + b4*x**4)
+
+and a fit is given by its eight coefficients (a0, a1, a2, a3, b1, b2, b3, b4).
+pade() evaluates one fit, or a stack of fits that share the same x, for a
+whole array of x at once using Horner's rule and in-place NumPy operations.
+'''
+
+import numpy as np
+
+NCOEFFICIENTS = 8
+
+def pade(x, coefficients, out=None, work=None):
+    '''
+    Evaluate the Padé approximant(s) with the given coefficients at every x.
+
+    coefficients is (a0, a1, a2, a3, b1, b2, b3, b4), in which case the
+    result has the shape of x, or a (models, 8) matrix of such rows, in which
+    case the result has one row per model. The result is written to out if it
+    is given. work is scratch space of shape (2,) + x.shape; passing out and
+    work from a previous call evaluates without allocating anything. out may
+    be x itself to evaluate a single model in place.
+    '''
+    x = np.asarray(x, dtype=np.float64)
+    coefficients = np.asarray(coefficients, dtype=np.float64)
+    stacked = coefficients.ndim == 2
+    rows = coefficients if stacked else coefficients[np.newaxis]
+    if rows.ndim != 2 or rows.shape[1] != NCOEFFICIENTS:
+        raise ValueError('a Padé approximant has %d coefficients, got shape %s'
+                         % (NCOEFFICIENTS, coefficients.shape))
+
+    if out is None:
+        out = np.empty((len(rows),) + x.shape if stacked else x.shape)
+    if work is None:
+        work = np.empty((2,) + x.shape)
+    if np.shares_memory(out, x):
+        # keep x while out is overwritten
+        np.copyto(work[1, ...], x)
+        x = work[1, ...]
+    den = work[0, ...]   # a view, also when x is a scalar
+
+    results = out if stacked else out[np.newaxis]
+    for k, (a0, a1, a2, a3, b1, b2, b3, b4) in enumerate(rows.tolist()):
+        result = results[k, ...]
+        # 1 + x*(b1 + x*(b2 + x*(b3 + x*b4)))
+        np.multiply(x, b4, out=den)
+        den += b3
+        den *= x
+        den += b2
+        den *= x
+        den += b1
+        den *= x
+        den += 1.0
+        # a0 + x*(a1 + x*(a2 + x*a3))
+        np.multiply(x, a3, out=result)
+        result += a2
+        result *= x
+        result += a1
+        result *= x
+        result += a0
+        result /= den
+    return out
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+'''
+Broadening of one .par file on several processes.
+
+.par records have a fixed length, so record i starts at byte i*record_length
+and the file can be cut into ranges of whole records without reading it. Each
+range is broadened by a worker process, which memory-maps only its own bytes
+(see parfile.map_record_range) and returns the output lines of the range;
+the main process writes the outputs of the ranges in their original order.
+Every line is computed independently of the others, so the output is
+byte-identical to that of a serial run.
+
+When the output is not compressed and every output line has the same
+length (the suffixes of most scripts have a fixed width), the offset of
+every output line follows from its line number as well. The output file is
+then preallocated and each worker writes its lines straight into its own
+region of it through a memory map, so nothing goes through the main process.
+The line length is taken from the first record; if a worker finds a line of
+another length (e.g. a value wider than its field), the file is written
+again the ordered way.
+
+Otherwise there are a few ranges per worker so that the workers stay busy,
+and only a couple of finished ranges per worker are held in memory waiting
+for their turn to be written. Each worker keeps the suffixes it has rendered
+(see broadeners.writer) from range to range.
+'''
+
+import io
+import math
+import os
+from collections import deque
+
+import numpy as np
+
+from broadeners.compression import compression, open_output
+from broadeners.parfile import fixed_record_length, map_record_range
+from broadeners.writer import write_chunk
+
+RANGES_PER_WORKER = 4
+
+# rendered suffixes of the worker process, per broaden() and (columns, fmt);
+# scripts such as CO_He_shifts and CO_H2_shifts share columns and format but
+# not their values
+_CACHES = {}
+
+def record_ranges(nrecords, workers, chunk_lines):
+    '''Return (first, count) of ranges of at most chunk_lines records, several per worker.'''
+    size = min(chunk_lines, max(1, math.ceil(nrecords / (RANGES_PER_WORKER * workers))))
+    return [(first, min(size, nrecords - first)) for first in range(0, nrecords, size)]
+
+def _cache(columns, broaden, fmt):
+    key = (broaden.__module__, broaden.__qualname__, repr(columns), fmt)
+    return _CACHES.setdefault(key, {})
+
+def broaden_range(readpath, first, count, record_length, columns, broaden, fmt):
+    '''Broaden records first .. first+count-1 of readpath and return their output lines.'''
+    records = map_record_range(readpath, first, count, record_length)
+    out = io.BytesIO()
+    write_chunk(out, records, columns, broaden, fmt, _cache(columns, broaden, fmt))
+    return out.getvalue(), len(records)
+
+#--------------positional writes into a preallocated output-------------------------------
+
+class _LineLengthChanged(Exception):
+    pass
+
+class _RegionWriter(object):
+    # file-like object writing into a memory-mapped region of the output file
+    def __init__(self, region):
+        self.region = region
+        self.position = 0
+
+    def write(self, data):
+        end = self.position + len(data)
+        if end > len(self.region):
+            raise _LineLengthChanged()
+        self.region[self.position:end] = np.frombuffer(data, dtype=np.uint8)
+        self.position = end
+        return len(data)
+
+def output_line_length(readpath, record_length, columns, broaden, fmt):
+    '''Return the length in bytes of the output line of the first record of readpath.'''
+    data, n = broaden_range(readpath, 0, 1, record_length, columns, broaden, fmt)
+    return len(data)
+
+def broaden_range_into(readpath, first, count, record_length, columns, broaden, fmt,
+                       savepath, line_length):
+    '''
+    Broaden records first .. first+count-1 of readpath and write their output
+    lines at byte first*line_length of the preallocated savepath. Returns
+    False if a line is not line_length bytes long; the output is then invalid.
+    '''
+    records = map_record_range(readpath, first, count, record_length)
+    if len(records) == 0:
+        return True
+    region = np.memmap(savepath, dtype=np.uint8, mode='r+', offset=first * line_length,
+                       shape=(len(records) * line_length,))
+    try:
+        lengths = write_chunk(_RegionWriter(region), records, columns, broaden, fmt,
+                              _cache(columns, broaden, fmt))
+    except _LineLengthChanged:
+        return False
+    region.flush()
+    return bool(np.all(lengths == line_length))
+
+def _write_positional(pool, readpath, savepath, columns, broaden, fmt, record_length,
+                      nrecords, ranges):
+    line_length = output_line_length(readpath, record_length, columns, broaden, fmt)
+    with open(savepath, 'wb') as f:
+        f.truncate(nrecords * line_length)
+    futures = [pool.submit(broaden_range_into, readpath, first, count, record_length,
+                           columns, broaden, fmt, savepath, line_length)
+               for first, count in ranges]
+    return all([future.result() for future in futures])
+
+#--------------ordered writes through the main process-------------------------------
+
+def _write_ordered(pool, readpath, savepath, columns, broaden, fmt, record_length, ranges,
+                   workers, compress_workers):
+    nlines = 0
+    with open_output(savepath, workers=compress_workers) as out:
+        pending = deque()
+        for first, count in ranges:
+            pending.append(pool.submit(broaden_range, readpath, first, count, record_length,
+                                       columns, broaden, fmt))
+            while len(pending) > 2 * workers:
+                data, n = pending.popleft().result()
+                out.write(data)
+                nlines += n
+        while pending:
+            data, n = pending.popleft().result()
+            out.write(data)
+            nlines += n
+    return nlines
+
+#--------------broaden a whole file-------------------------------
+
+def broaden_parallel(readpath, savepath, columns, broaden, fmt, workers, chunk_lines,
+                     compress_workers=None):
+    '''
+    Broaden the plain fixed-length .par file readpath on workers processes and
+    write the output lines to savepath in the original order, in place in a
+    preallocated file when the output lines have a fixed length. Returns the
+    number of lines written.
+    '''
+    from concurrent.futures import ProcessPoolExecutor
+
+    record_length = fixed_record_length(readpath)
+    if record_length is None:
+        raise ValueError('%s: parallel broadening needs an uncompressed .par file '
+                         'whose lines all have the same length' % readpath)
+    nrecords = -(-os.path.getsize(readpath) // record_length)   # the last newline may be missing
+    ranges = record_ranges(nrecords, workers, chunk_lines)
+    with ProcessPoolExecutor(workers) as pool:
+        if compression(savepath) is None and \
+           _write_positional(pool, readpath, savepath, columns, broaden, fmt, record_length,
+                             nrecords, ranges):
+            return nrecords
+        return _write_ordered(pool, readpath, savepath, columns, broaden, fmt, record_length,
+                              ranges, workers, compress_workers)
@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+'''
+Fast reader for HITRAN 160-character .par line lists.
+
+Every .par record is a fixed-length line (160 characters plus the line
+terminator), so a whole file can be viewed as a 2-D array of bytes with one
+row per transition. Columns are sliced straight out of that array and turned
+into typed NumPy arrays without creating a Python string for every cell.
+
+The column specification is the one the broadening scripts used to pass to
+astropy's FixedWidthNoHeader reader: names, col_starts and col_ends, where
+col_ends are inclusive. As with astropy, the type of every column is guessed
+from its contents (int, then float, then str), surrounding blanks are removed
+and empty cells are read as 0.
+
+Compressed files (.gz, .bz2, .xz) are decompressed while they are read.
+'''
+
+import os
+
+import numpy as np
+
+from broadeners.compression import compression, open_input
+
+PAR_WIDTH = 160   # characters in one HITRAN .par record, without the newline
+
+NU_COLUMN = (3, 14)    # .par characters of the wavenumber nu (cm-1)
+S_COLUMN = (15, 24)    # .par characters of the line intensity S
+
+_NEWLINE = ord('\n')
+_SPACE = ord(' ')
+_PLUS = ord('+')
+_MINUS = ord('-')
+_ZERO = ord('0')
+_NINE = ord('9')
+
+#--------------split the file into fixed-length records-------------------------------
+
+def _fixed_records(buffer):
+    # view a 1-D uint8 buffer as (lines, record length - 1) records, leaving out
+    # the newline of every record; returns None if the lines differ in length
+    size = len(buffer)
+    stop = np.flatnonzero(buffer[:4096] == _NEWLINE)
+    if len(stop) == 0:
+        return None
+    reclen = int(stop[0]) + 1
+    if size % reclen == 0:
+        nlines = size // reclen
+    elif size % reclen == reclen - 1:
+        nlines = size // reclen + 1   # last line without a newline
+    else:
+        return None
+    if not np.all(buffer[reclen - 1::reclen] == _NEWLINE):
+        return None
+    return np.lib.stride_tricks.as_strided(buffer, shape=(nlines, reclen - 1),
+                                           strides=(reclen, 1), writeable=False)
+
+def records_from_bytes(data):
+    '''
+    Return the .par records in data as a (lines, record length) uint8 array,
+    without the line terminators. The array is a view on data whenever all
+    lines have the same length; otherwise blank lines are left out, as with
+    astropy.
+    '''
+    if len(data) == 0:
+        return np.zeros((0, PAR_WIDTH), dtype=np.uint8)
+    records = _fixed_records(np.frombuffer(data, dtype=np.uint8))
+    if records is not None:
+        return records
+
+    # lines of different length: pad or cut every line to the 160 .par characters
+    data = b''.join([line.ljust(PAR_WIDTH)[:PAR_WIDTH] for line in data.splitlines() if line.strip()])
+    return np.frombuffer(data, dtype=np.uint8).reshape(-1, PAR_WIDTH)
+
+def open_records(readpath, mmap=False):
+    '''
+    Return the records of a .par file as a (lines, record length) uint8 array.
+
+    With mmap=True the file is not read into memory: the array is a view on an
+    np.memmap of the file, so only the pages of the columns that are actually
+    sliced out are brought in by the operating system. Files whose lines are
+    not all the same length, and compressed files, cannot be mapped and are
+    read as usual.
+    '''
+    if mmap and compression(readpath) is None and os.path.getsize(readpath) > 0:
+        records = _fixed_records(np.memmap(readpath, dtype=np.uint8, mode='r'))
+        if records is not None:
+            return records
+    with open_input(readpath) as f:
+        data = f.read()
+    return records_from_bytes(data)
+
+def fixed_record_length(readpath):
+    '''
+    Return the length in bytes of every record, with its newline, of a plain
+    .par file whose lines all have the same length, or None for any other
+    file (compressed, empty or with lines of different length).
+    '''
+    if compression(readpath) is not None or os.path.getsize(readpath) == 0:
+        return None
+    buffer = np.memmap(readpath, dtype=np.uint8, mode='r')
+    if _fixed_records(buffer) is None:
+        return None
+    return int(np.flatnonzero(buffer[:4096] == _NEWLINE)[0]) + 1
+
+def map_record_range(readpath, first, count, record_length):
+    '''
+    Return records first .. first+count-1 of a plain fixed-length .par file
+    (see fixed_record_length) as a view on an np.memmap of just their bytes.
+    '''
+    size = os.path.getsize(readpath)
+    start = first * record_length
+    stop = min((first + count) * record_length, size)
+    if count <= 0 or start >= size:
+        return np.zeros((0, record_length - 1), dtype=np.uint8)
+    buffer = np.memmap(readpath, dtype=np.uint8, mode='r', offset=start, shape=(stop - start,))
+    return _fixed_records(buffer)
+
+def _stream_records(f, chunk_lines):
+    # read about chunk_lines records at a time, cutting the blocks at line ends
+    rest = b''
+    while True:
+        block = f.read(chunk_lines * (PAR_WIDTH + 1))
+        if not block:
+            break
+        data = rest + block
+        cut = data.rfind(b'\n') + 1
+        if cut == 0:
+            rest = data
+            continue
+        rest = data[cut:]
+        yield records_from_bytes(data[:cut])
+    if rest:
+        yield records_from_bytes(rest)
+
+def iter_records(readpath, chunk_lines, mmap=True):
+    '''
+    Yield the records of a .par file in blocks of about chunk_lines records.
+
+    Plain files are memory-mapped (see open_records) and sliced; compressed
+    files are decompressed as a stream, so neither is ever held in memory as
+    a whole.
+    '''
+    if compression(readpath) is None:
+        records = open_records(readpath, mmap=mmap)
+        for start in range(0, len(records), chunk_lines):
+            yield records[start:start + chunk_lines]
+    else:
+        with open_input(readpath) as f:
+            for records in _stream_records(f, chunk_lines):
+                yield records
+
+def par_line(records, i):
+    '''Return the 160 .par characters of record i as a str.'''
+    return records[i, :PAR_WIDTH].tobytes().decode('latin-1')
+
+#--------------convert byte columns to typed arrays-------------------------------
+
+def _parse_int(cells):
+    # cells is a (lines, width) uint8 array; returns None if any cell is not an integer
+    is_digit = (cells >= _ZERO) & (cells <= _NINE)
+    is_sign = (cells == _MINUS) | (cells == _PLUS)
+    if not np.all(is_digit | is_sign | (cells == _SPACE)):
+        return None
+    if is_sign.any():
+        # at most one sign per cell, and it has to come before the digits
+        digits_before = np.cumsum(is_digit, axis=1)
+        if np.any(is_sign.sum(axis=1) > 1) or np.any(digits_before[is_sign] > 0):
+            return None
+
+    value = np.zeros(len(cells), dtype=np.int64)
+    for k in range(cells.shape[1]):
+        value = np.where(is_digit[:, k], value * 10 + (cells[:, k] - _ZERO), value)
+    negative = np.any(cells == _MINUS, axis=1)
+    value[negative] = -value[negative]
+    return value
+
+def _as_strings(cells):
+    width = cells.shape[1]
+    return np.ascontiguousarray(cells).view('S%d' % width).ravel()
+
+def _parse_float(cells):
+    strings = _as_strings(cells)
+    blank = np.all(cells == _SPACE, axis=1)
+    if blank.any():
+        strings = strings.copy()
+        strings[blank] = b'0'
+    try:
+        return strings.astype(np.float64)
+    except ValueError:
+        return None
+
+def _parse_str(cells):
+    return np.char.strip(_as_strings(cells).astype('U'))
+
+def parse_column(records, start, end):
+    '''
+    Return the characters start..end (inclusive) of every record as an int,
+    float or str array, whichever fits all of the cells.
+    '''
+    cells = records[:, start:end + 1]
+    column = _parse_int(cells)
+    if column is None:
+        column = _parse_float(cells)
+    if column is None:
+        column = _parse_str(cells)
+    return column
+
+def parse_columns(records, names, col_starts, col_ends):
+    '''Slice the named columns out of records and return them in a dict.'''
+    if not len(names) == len(col_starts) == len(col_ends):
+        raise ValueError('names, col_starts and col_ends must have the same length')
+    total = {}
+    for name, start, end in zip(names, col_starts, col_ends):
+        total[name] = parse_column(records, start, end)
+    return total
+
+#--------------read a .par file-------------------------------
+
+def read_par(readpath, names, col_starts, col_ends, mmap=False):
+    '''
+    Read the named fixed-width columns of a HITRAN .par file.
+
+    This takes the same column specification as the astropy
+    FixedWidthNoHeader reader used before, for example
+
+        total = read_par(readpath, names=('hitpar', 'Br', 'J_'),
+                         col_starts=(0, 117, 118), col_ends=(159, 117, 120))
+
+    and returns a dict of NumPy arrays keyed by column name. With mmap=True
+    the file is memory-mapped and only the requested columns are materialized.
+    '''
+    records = open_records(readpath, mmap=mmap)
+    return parse_columns(records, names, col_starts, col_ends)
@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+'''
+Streaming driver shared by the broadening scripts.
+
+A .par file is processed in chunks of a fixed number of records: the quantum
+number columns of a chunk are parsed, the script's broaden() function turns
+them into the output columns, and the output rows of the chunk are appended
+to the output file before the next chunk is read (see broadeners.writer).
+Every line is computed independently of the others, so the output does not
+depend on the chunk size.
+
+Only the modules of the plain text path are imported up front; the columnar
+store, incremental, profile and cross-section outputs are imported when they
+are used, which keeps the startup of a script short.
+'''
+
+import os
+import warnings
+
+import numpy as np
+
+from broadeners.compression import open_output
+from broadeners.index import iter_window
+from broadeners.parfile import iter_records
+from broadeners.writer import write_chunk
+
+DEFAULT_CHUNK_LINES = 200000
+
+# rough upper estimate of the memory needed per line of a chunk: the output
+# lines of the chunk plus the key and index arrays used to assemble them
+BYTES_PER_LINE = 1024
+
+#--------------chunking-------------------------------
+
+def chunk_lines_for_memory(max_memory):
+    '''Return the number of lines per chunk that fits in max_memory bytes.'''
+    return max(1, int(max_memory) // BYTES_PER_LINE)
+
+def numbered_chunks(readpath, chunk_lines, nu_min=None, nu_max=None):
+    '''
+    Yield (record numbers, records) for the chunks of readpath; with nu_min
+    and/or nu_max only the lines inside that wavenumber window are returned.
+    '''
+    if nu_min is not None or nu_max is not None:
+        for numbers, records in iter_window(readpath, nu_min, nu_max, chunk_lines):
+            yield numbers, records
+        return
+    first = 0
+    for records in iter_records(readpath, chunk_lines):
+        yield np.arange(first, first + len(records)), records
+        first += len(records)
+
+#--------------read, broaden and write a whole file-------------------------------
+
+def _check_paths(readpath, savepath):
+    '''
+    Check that readpath can be read and is not savepath, before the output
+    is created (opening the output truncates it).
+    '''
+    with open(readpath, 'rb'):
+        pass
+    if os.path.exists(savepath) and os.path.samefile(readpath, savepath):
+        raise ValueError('the output would overwrite the input: %s' % savepath)
+
+def broaden_file(readpath, savepath, columns, broaden, fmt, chunk_lines=DEFAULT_CHUNK_LINES,
+                 output_format='par', compress_workers=None, nu_min=None, nu_max=None,
+                 incremental=False, temperatures=None, profile=None,
+                 workers=None, overlap=False):
+    '''
+    Broaden the .par file readpath and write the result to savepath.
+
+    columns is the column specification of the quantum numbers
+    (dict with names, col_starts and col_ends), broaden(total) returns the
+    output columns in the order of fmt, and at most chunk_lines records are
+    held in memory at a time. With output_format='npy' savepath is written as
+    a columnar store (see broadeners.store) instead of a text file.
+    Compressed input and output are recognized by their extension (see
+    broadeners.compression); gzip output is compressed on compress_workers
+    threads. With nu_min and/or nu_max only the lines in that wavenumber
+    window are broadened and written (see broadeners.index). With
+    incremental=True the lines of unchanged records are copied from the
+    previous output in savepath (see broadeners.incremental). With a list of
+    temperatures (K) the npy store also gets the half width of every
+    broadener at each of them (see broadeners.temperature). With a profile
+    (a file name or the dict returned by broadeners.profile.read_profile)
+    the npy store holds the mixture width and shifted position of every line
+    in every layer instead of the broadening columns (see broadeners.profile).
+    With workers > 1 a plain .par output is computed on that many processes
+    (see broadeners.parallel); an input that cannot be cut into ranges
+    (compressed, or with lines of different length) is broadened on one
+    process with a warning. With overlap=True a single-process run reads
+    and writes on background threads while it broadens (see
+    broadeners.overlap).
+    Returns the number of lines written.
+    '''
+    _check_paths(readpath, savepath)
+    nlines = 0
+    chunks = numbered_chunks(readpath, chunk_lines, nu_min, nu_max)
+    if temperatures is not None and output_format != 'npy':
+        raise ValueError("a temperature grid needs output_format='npy'")
+    if profile is not None:
+        if output_format != 'npy':
+            raise ValueError("a profile needs output_format='npy'")
+        if temperatures is not None:
+            raise ValueError('a profile and a temperature grid cannot be combined')
+        if isinstance(profile, str):
+            from broadeners.profile import read_profile
+            profile = read_profile(profile)
+    parallel = workers is not None and workers > 1
+    if parallel and (output_format != 'par' or incremental or nu_min is not None
+                     or nu_max is not None):
+        raise ValueError('parallel broadening only writes whole .par outputs')
+    if parallel:
+        from broadeners.parfile import fixed_record_length
+        if fixed_record_length(readpath) is None:
+            warnings.warn('%s is not an uncompressed .par file with lines of equal length; '
+                          'broadening it on one process' % readpath, stacklevel=2)
+            parallel = False
+    if overlap and not parallel:
+        from broadeners.overlap import prefetch_chunks
+        chunks = prefetch_chunks(chunks)
+    if parallel:
+        from broadeners.parallel import broaden_parallel
+        nlines = broaden_parallel(readpath, savepath, columns, broaden, fmt, workers,
+                                  chunk_lines, compress_workers=compress_workers)
+    elif incremental:
+        if output_format != 'par':
+            raise ValueError("incremental mode needs output_format='par'")
+        from broadeners.incremental import write_incremental
+        nlines, nreused = write_incremental(chunks, savepath, columns, broaden, fmt)
+    elif output_format == 'npy':
+        from broadeners.profile import start_profile, add_profile_chunk
+        from broadeners.store import start_store, add_chunk, finish_store
+        store = start_store(savepath, source=readpath, temperatures=temperatures)
+        if profile is not None:
+            start_profile(store, profile)
+        for numbers, chunk in chunks:
+            if profile is not None:
+                add_profile_chunk(store, chunk, numbers, columns, broaden, profile)
+            else:
+                add_chunk(store, chunk, numbers, columns, broaden)
+            nlines += len(chunk)
+        finish_store(store)
+    elif output_format == 'par':
+        cache = {}
+        with open_output(savepath, workers=compress_workers) as out:
+            if overlap:
+                from broadeners.overlap import BackgroundWriter
+                with BackgroundWriter(out) as writer:
+                    for numbers, chunk in chunks:
+                        write_chunk(writer, chunk, columns, broaden, fmt, cache)
+                        nlines += len(chunk)
+            else:
+                for numbers, chunk in chunks:
+                    write_chunk(out, chunk, columns, broaden, fmt, cache)
+                    nlines += len(chunk)
+    else:
+        raise ValueError('unknown output format: %r' % output_format)
+    return nlines
+
+#--------------cross-sections of a whole file-------------------------------
+
+def cross_section_file(readpath, savepath, columns, broaden, profile, grid,
+                       wing_cutoff=None, workers=None,
+                       chunk_lines=DEFAULT_CHUNK_LINES):
+    '''
+    Compute the cross-sections of the .par file readpath on the wavenumber
+    grid for every layer of profile (a file name or the dict returned by
+    broadeners.profile.read_profile), see broadeners.xsec, and save them to
+    savepath as a NumPy .npz file with the arrays nu (the grid),
+    cross_section (layers x grid, cm2/molecule), P and T.
+    Only the lines within wing_cutoff (default xsec.DEFAULT_WING_CUTOFF) of
+    the grid are read; the segments of the grid are computed on workers
+    processes.
+    Returns the number of lines used.
+    '''
+    _check_paths(readpath, savepath)
+    from broadeners.profile import read_profile
+    from broadeners.xsec import DEFAULT_WING_CUTOFF, SHIFT_MARGIN, grid_lines, cross_sections
+    if wing_cutoff is None:
+        wing_cutoff = DEFAULT_WING_CUTOFF
+    if isinstance(profile, str):
+        profile = read_profile(profile)
+    grid = np.asarray(grid, dtype=np.float64)
+    margin = wing_cutoff + SHIFT_MARGIN
+    lines = grid_lines(numbered_chunks(readpath, chunk_lines, grid[0] - margin, grid[-1] + margin),
+                       columns, broaden, profile)
+    sigma = cross_sections(lines, profile, grid, wing_cutoff=wing_cutoff, workers=workers)
+    with open(savepath, 'wb') as f:
+        np.savez(f, nu=grid, cross_section=sigma, P=profile['P'], T=profile['T'])
+    return len(lines['nu'])
@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+'''
+Line widths and positions through a planetary atmosphere profile.
+
+A profile is a whitespace-separated text file with one layer per row: the
+pressure P (atm), the temperature T (K) and the volume mixing ratio of every
+broadener in the layer, under a header naming the columns, e.g.
+
+    # Jupiter, H2/He
+    P       T      H2     He
+    0.001   160.0  0.864  0.136
+    0.1     112.0  0.864  0.136
+    1.0     165.0  0.864  0.136
+
+Lines starting with # are comments. For every line and layer the effective
+Lorentz half width (HWHM, cm-1) of the mixture and the pressure-shifted line
+position (cm-1) are
+
+    gamma_L = P * sum_X x_X * gamma_X * (T0/T)**n_X
+    nu_L    = nu + P * sum_X x_X * delta_X
+
+where x_X is the mixing ratio of broadener X in the layer and gamma_X, n_X
+and delta_X are the output columns of the script (T0 = 296 K). The shifts
+are taken as independent of temperature; scripts without delta_X columns
+(all except CO_with_shifts.py) leave nu_L = nu. Every broadener of the
+profile must have gamma_X and n_X columns in the script.
+
+The results are saved in a columnar store (see broadeners.store) with the
+nu, S and record columns and two lines x layers columns, gamma_L (float32)
+and nu_L (float64); the profile is saved in the manifest. Like the other
+columns they are computed once per distinct set of quantum numbers, and
+only for a block of layers at a time, so the memory used stays bounded by
+the chunk size whatever the number of layers; the chunk columns themselves
+are filled in place as memory-mapped .npy files.
+'''
+
+import numpy as np
+
+from broadeners.store import (chunk_columns, new_chunk, open_column, save_column,
+                              end_chunk, key_values)
+from broadeners.temperature import T_REF, broadeners
+
+PRESSURE = 'P'
+TEMPERATURE = 'T'
+
+WIDTH_COLUMN = 'gamma_L'
+POSITION_COLUMN = 'nu_L'
+
+# number of (distinct key, layer) values computed at a time
+BLOCK_VALUES = 4000000
+
+#--------------read a profile-------------------------------
+
+def read_profile(path):
+    '''
+    Read a profile file and return dict(P=pressures, T=temperatures,
+    vmr={broadener: mixing ratios}), one value per layer.
+    '''
+    with open(path) as f:
+        rows = [line.split() for line in f
+                if line.strip() and not line.lstrip().startswith('#')]
+    if not rows:
+        raise ValueError('%s: empty profile' % path)
+    header = rows[0]
+    for name in (PRESSURE, TEMPERATURE):
+        if name not in header:
+            raise ValueError('%s: the header needs a %s column: %s' % (path, name, ' '.join(header)))
+    if len(set(header)) != len(header):
+        raise ValueError('%s: repeated column in the header: %s' % (path, ' '.join(header)))
+    for number, row in enumerate(rows[1:], 2):
+        if len(row) != len(header):
+            raise ValueError('%s: layer %d has %d values for %d columns'
+                             % (path, number - 1, len(row), len(header)))
+    try:
+        data = np.array(rows[1:], dtype=np.float64).reshape(-1, len(header))
+    except ValueError as error:
+        raise ValueError('%s: %s' % (path, error))
+    if len(data) == 0:
+        raise ValueError('%s: no layers in the profile' % path)
+
+    columns = dict(zip(header, data.T))
+    profile = {'P': columns.pop(PRESSURE), 'T': columns.pop(TEMPERATURE), 'vmr': columns}
+    return check_profile(profile, path)
+
+def check_profile(profile, name='profile'):
+    '''Check the values of a profile and return it.'''
+    if np.any(profile['P'] < 0):
+        raise ValueError('%s: negative pressure' % name)
+    if np.any(profile['T'] <= 0):
+        raise ValueError('%s: temperatures must be positive' % name)
+    for gas, vmr in profile['vmr'].items():
+        if np.any((vmr < 0) | (vmr > 1)):
+            raise ValueError('%s: mixing ratio of %s outside [0, 1]' % (name, gas))
+    return profile
+
+#--------------widths and positions of one block of layers-------------------------------
+
+def check_broadeners(values, profile):
+    '''Raise a ValueError if a broadener of the profile has no gamma_X and n_X columns.'''
+    missing = [gas for gas in profile['vmr']
+               if 'gamma_' + gas not in values or 'n_' + gas not in values]
+    if missing:
+        raise ValueError('no gamma and n columns for broadener(s) %s of the profile; '
+                         'the script gives %s' % (', '.join(missing), ', '.join(broadeners(values))))
+
+def layer_widths(values, profile, layers):
+    '''Return gamma_L of every key (rows) in the layers (columns), as float64.'''
+    ratio = T_REF / profile['T'][layers]
+    width = np.zeros((len(next(iter(values.values()))), len(ratio)))
+    for gas, vmr in profile['vmr'].items():
+        gamma = np.asarray(values['gamma_' + gas], dtype=np.float64)
+        n = np.asarray(values['n_' + gas], dtype=np.float64)
+        width += gamma[:, np.newaxis] * ratio ** n[:, np.newaxis] \
+                 * (profile['P'][layers] * vmr[layers])
+    return width
+
+def layer_shifts(values, profile, layers):
+    '''Return the pressure shift of every key (rows) in the layers (columns).'''
+    shift = np.zeros((len(next(iter(values.values()))), len(profile['P'][layers])))
+    for gas, vmr in profile['vmr'].items():
+        if 'delta_' + gas in values:
+            delta = np.asarray(values['delta_' + gas], dtype=np.float64)
+            shift += delta[:, np.newaxis] * (profile['P'][layers] * vmr[layers])
+    return shift
+
+#--------------write a store-------------------------------
+
+def layer_blocks(nlayers, nkeys):
+    '''Yield slices of layers that keep a block of keys x layers below BLOCK_VALUES.'''
+    step = max(1, BLOCK_VALUES // max(1, nkeys))
+    for start in range(0, nlayers, step):
+        yield slice(start, min(start + step, nlayers))
+
+def start_profile(store, profile):
+    '''Record the profile in the manifest of a store started with start_store.'''
+    store['profile'] = {'P': profile['P'].tolist(), 'T': profile['T'].tolist(),
+                        'vmr': {gas: vmr.tolist() for gas, vmr in profile['vmr'].items()}}
+
+def add_profile_chunk(store, records, record_numbers, columns, broaden, profile):
+    '''
+    Broaden a chunk of records and save nu, S, record, gamma_L and nu_L of its
+    lines in all layers of the profile as a new store chunk.
+    '''
+    if len(records) == 0:
+        return
+    data = chunk_columns(store, records, record_numbers)
+    values, inverse = key_values(records, columns, broaden)
+    check_broadeners(values, profile)
+
+    chunk = new_chunk(store)
+    for column, array in data.items():
+        save_column(store, chunk, column, array)
+    shape = (len(records), len(profile['P']))
+    width = open_column(store, chunk, WIDTH_COLUMN, shape, np.float32)
+    position = open_column(store, chunk, POSITION_COLUMN, shape, np.float64)
+    for layers in layer_blocks(shape[1], len(inverse)):
+        width[:, layers] = layer_widths(values, profile, layers)[inverse]
+        position[:, layers] = data['nu'][:, np.newaxis] + layer_shifts(values, profile, layers)[inverse]
+    width.flush()
+    position.flush()
+    del width, position
+    end_chunk(store, chunk, data)
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+'''
+Mapping of the quantum numbers of a chunk of lines to the model inputs.
+
+Most fits are functions of the rotational running index |m|, which is
+related to the lower J rotational quantum number as follows:
+
+    P branch: m = -J" (|m| = J")
+    Q branch: m = J"
+    R branch: m = J" + 1
+
+The functions here compute |m| for whole arrays of lines. A line that cannot
+be mapped (a branch other than P, Q or R, or upper and lower J that differ by
+more than one) is reported with a ValueError instead of being left out, which
+would misalign the output columns with the lines. The per-molecule clamp
+rules are applied to the result by the lookup tables of the molecule (the
+clip and set rules of broadeners.coefficients).
+'''
+
+import numpy as np
+
+BRANCHES = ('P', 'Q', 'R')
+BRANCH_SIGNS = (1, 0, -1)   # sign of the rotational shift term of P, Q and R lines
+
+MAX_REPORTED = 5   # unmapped lines listed in the error message
+
+def check_mapped(mapped, what, **columns):
+    '''
+    Raise a ValueError naming the lines where mapped is False; what describes
+    the problem and columns are the quantum numbers shown for those lines.
+    '''
+    bad = np.flatnonzero(~np.asarray(mapped, dtype=bool))
+    if len(bad) == 0:
+        return
+    lines = ['(%s)' % ', '.join('%s=%r' % (name, np.asarray(column)[i].item())
+                                for name, column in columns.items())
+             for i in bad[:MAX_REPORTED]]
+    raise ValueError('cannot map %d line(s) with %s: %s%s'
+                     % (len(bad), what, ', '.join(lines),
+                        ', ...' if len(bad) > MAX_REPORTED else ''))
+
+def running_index(branch, J):
+    '''Return |m| for every line from its branch letter and lower J.'''
+    branch = np.asarray(branch)
+    J = np.asarray(J)
+    check_mapped(np.isin(branch, BRANCHES), 'a branch other than P, Q or R', branch=branch, J=J)
+    return J + (branch == 'R')
+
+def branch_sign(branch):
+    '''Return +1, 0 or -1 for every P, Q or R line (the y of the CO shift models).'''
+    branch = np.asarray(branch)
+    check_mapped(np.isin(branch, BRANCHES), 'a branch other than P, Q or R', branch=branch)
+    return np.select([branch == b for b in BRANCHES], BRANCH_SIGNS)
+
+def running_index_from_j(J_upp, J_low):
+    '''Return |m| for every line from its upper and lower J (J' = J"-1, J" or J"+1).'''
+    J_upp = np.asarray(J_upp)
+    J_low = np.asarray(J_low)
+    dJ = J_upp - J_low
+    check_mapped(np.abs(dJ) <= 1, 'J\' and J" more than one apart', J_upp=J_upp, J_low=J_low)
+    return J_low + (dJ == 1)
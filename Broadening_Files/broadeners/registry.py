@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+'''
+Registry of the broadening models, for use of the scripts as a library.
+
+The molecule scripts (CO.py, CO2.py, ...) only ask for file names when they
+are run, so they can be imported; this module finds the right script for a
+molecule and gives the models it implements:
+
+    from broadeners import registry
+    from broadeners.parfile import open_records
+
+    registry.models('CO', parameter='delta')
+    # [Model(molecule='CO', broadener='He', parameter='delta', column='delta_He', ...), ...]
+
+    records = open_records('Input-Broadening-Files/sample_CO.par')
+    values = registry.broaden(records, 'CO', broadeners=('H2', 'He'))
+    values['gamma_H2'], values['n_H2'], values['delta_H2']   # one value per line
+
+A model is one parameter (gamma, the half width; n, its temperature
+exponent; or delta, the pressure shift) of one molecule with one broadener,
+with the names of its value, uncertainty code and reference columns.
+broaden() takes the lines either as .par records (see broadeners.parfile)
+or as a dict of quantum-number columns, and evaluates the script once per
+distinct set of quantum numbers. The columns have the same names for all
+molecules (QUANTA; the scripts name their fields differently), and
+input_columns() gives those a molecule needs:
+
+    registry.input_columns('CO', parameters=('gamma', 'n'))   # ['branch', 'J']
+    registry.broaden({'branch': ['P', 'R'], 'J': [1, 2]}, 'CO', parameters=('gamma',))
+
+The shifts of CO also need the vibrational quanta v_upper and v_lower, so
+these are only needed when delta is asked for.
+'''
+
+import importlib
+import os
+import sys
+from collections import namedtuple
+
+import numpy as np
+
+from broadeners.coefficients import column_names
+from broadeners.store import key_values
+
+PARAMETERS = ('gamma', 'n', 'delta')
+
+SCRIPT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# molecule: HITRAN molecule number, script of gamma and n, broadeners of gamma and n,
+# broadeners of delta and the script that also gives delta
+MOLECULES = {'CO2': dict(number=2, script='CO2', broadeners=('He', 'H2', 'CO2'), shifts=()),
+             'N2O': dict(number=4, script='N2O', broadeners=('He',), shifts=()),
+             'CO': dict(number=5, script='CO', broadeners=('He', 'H2', 'CO2'),
+                        shifts=('He', 'H2', 'CO2'), shift_script='CO_with_shifts'),
+             'OCS': dict(number=19, script='OCS', broadeners=('He', 'H2'), shifts=()),
+             'H2CO': dict(number=20, script='H2CO', broadeners=('He', 'H2'), shifts=()),
+             'HCN': dict(number=23, script='HCN', broadeners=('He', 'H2'), shifts=()),
+             'PH3': dict(number=28, script='PH3', broadeners=('He', 'H2'), shifts=()),
+             'H2S': dict(number=31, script='H2S', broadeners=('He', 'H2'), shifts=())}
+
+# names of the quantum-number columns of broaden(), by their .par characters
+QUANTA = {(35, 40): 'gamma_air',   # air-broadened half width (H2CO)
+          (79, 86): 'v_upper',     # upper vibrational quantum number (CO shifts)
+          (96, 99): 'v_lower',     # lower vibrational quantum number (CO shifts)
+          (98, 100): 'J_upper',    # J' (PH3)
+          (101, 102): 'Ka_upper',  # Ka' (PH3)
+          (113, 114): 'J',         # J" (H2CO, H2S, PH3)
+          (116, 117): 'Ka',        # Ka" (H2CO, H2S)
+          (117, 117): 'branch',    # P, Q or R
+          (118, 120): 'J'}         # J" of the linear molecules
+
+# the kind of values of the quantum-number columns other than integers
+TEXT_QUANTA = ('branch',)
+REAL_QUANTA = ('gamma_air',)
+
+Model = namedtuple('Model', 'molecule broadener parameter column err ref')
+
+def _model(molecule, broadener, parameter):
+    return Model(molecule, broadener, parameter, *column_names(broadener, parameter))
+
+#--------------look up models-------------------------------
+
+def molecule_entry(molecule):
+    '''Return the registry entry of a molecule.'''
+    if molecule not in MOLECULES:
+        raise ValueError('no broadening models for %r; known molecules: %s'
+                         % (molecule, ', '.join(MOLECULES)))
+    return MOLECULES[molecule]
+
+def molecule_name(number):
+    '''Return the name of the molecule with a HITRAN molecule number.'''
+    for molecule, entry in MOLECULES.items():
+        if entry['number'] == number:
+            return molecule
+    raise ValueError('no broadening models for HITRAN molecule %r' % (number,))
+
+def models(molecule=None, broadener=None, parameter=None):
+    '''Return the models in the registry, optionally only those of a molecule, broadener or parameter.'''
+    if parameter is not None and parameter not in PARAMETERS:
+        raise ValueError('unknown parameter %r; expected one of %s' % (parameter, ', '.join(PARAMETERS)))
+    result = []
+    for name in ([molecule] if molecule is not None else MOLECULES):
+        entry = molecule_entry(name)
+        for kind in PARAMETERS:
+            gases = entry['shifts'] if kind == 'delta' else entry['broadeners']
+            result.extend(_model(name, gas, kind) for gas in gases
+                          if broadener in (None, gas) and parameter in (None, kind))
+    return result
+
+def _import_script(name):
+    if SCRIPT_DIR not in sys.path:
+        sys.path.append(SCRIPT_DIR)
+    return importlib.import_module(name)
+
+def load_script(molecule):
+    '''
+    Import and return a script by name (e.g. CO, which writes the CO.py
+    output, or CO_H2_shifts); a molecule of the registry without a script of
+    its name is looked up in the registry.
+    '''
+    if os.path.isfile(os.path.join(SCRIPT_DIR, str(molecule) + '.py')):
+        return _import_script(molecule)
+    return _import_script(molecule_entry(molecule)['script'])
+
+#--------------evaluate models-------------------------------
+
+def _script_of(molecule, parameters):
+    # the script of the molecule that gives the parameters
+    entry = molecule_entry(molecule)
+    if 'delta' in parameters and entry['shifts']:
+        return _import_script(entry['shift_script'])
+    return _import_script(entry['script'])
+
+def input_columns(molecule, parameters=PARAMETERS):
+    '''Return the names of the quantum-number columns broaden() needs for the parameters of a molecule.'''
+    columns = _script_of(molecule, parameters).COLUMNS
+    names = []
+    for start, end in zip(columns['col_starts'], columns['col_ends']):
+        if QUANTA[start, end] not in names:
+            names.append(QUANTA[start, end])
+    return names
+
+def broaden(lines, molecule, broadeners=None, parameters=PARAMETERS, codes=False):
+    '''
+    Return {column: array} with the parameters of the molecule for every line
+    and broadener (all of the molecule's broadeners by default). lines is a
+    (lines, 160) array of .par records or a dict of the quantum-number
+    columns of input_columns(). With codes=True the uncertainty codes and
+    references are returned too.
+    '''
+    if broadeners is not None:
+        known = set(model.broadener for model in models(molecule))
+        unknown = [gas for gas in broadeners if gas not in known]
+        if unknown:
+            raise ValueError('no %s models for broadener(s) %s' % (molecule, ', '.join(unknown)))
+    selected = [model for model in models(molecule) if model.parameter in parameters
+                and (broadeners is None or model.broadener in broadeners)]
+    script = _script_of(molecule, [model.parameter for model in selected])
+
+    if isinstance(lines, dict):
+        values, inverse = key_values(_records_of(lines, script.COLUMNS), script.COLUMNS,
+                                     script.broaden)
+    else:
+        values, inverse = key_values(np.asarray(lines), script.COLUMNS, script.broaden)
+    names = []
+    for model in selected:
+        names.extend((model.column, model.err, model.ref) if codes else (model.column,))
+    return {name: values[name][inverse] for name in names}
+
+def _check_kind(name, values):
+    if values.size == 0:
+        return
+    if name in TEXT_QUANTA:
+        kinds, expected = 'US', 'strings'
+    elif name in REAL_QUANTA:
+        kinds, expected = 'iuf', 'numbers'
+    else:
+        kinds, expected = 'iu', 'integers'
+    if values.dtype.kind not in kinds:
+        raise ValueError('the values of %s must be %s, not %s' % (name, expected, values.dtype))
+
+def _records_of(lines, columns):
+    # lay the quantum-number columns out as .par records, so that they are read
+    # exactly as the script reads them from a file
+    fields = list(zip([QUANTA[start, end] for start, end in zip(columns['col_starts'], columns['col_ends'])],
+                      columns['col_starts'], columns['col_ends']))
+    missing = [name for name, start, end in fields if name not in lines]
+    if missing:
+        raise ValueError('missing quantum-number column(s) %s' % ', '.join(missing))
+    for name in set(name for name, start, end in fields):
+        _check_kind(name, np.asarray(lines[name]))
+    nlines = len(lines[fields[0][0]])
+    records = np.full((nlines, max(columns['col_ends']) + 1), ord(' '), dtype=np.uint8)
+    for name, start, end in fields:
+        width = end - start + 1
+        cells = np.char.rjust(np.asarray(lines[name]).astype('U'), width)
+        if len(cells) != nlines:
+            raise ValueError('%s has %d values, expected %d' % (name, len(cells), nlines))
+        if np.any(np.char.str_len(cells) > width):
+            raise ValueError('values of %s do not fit in %d characters' % (name, width))
+        records[:, start:end + 1] = cells.astype('S%d' % width).view(np.uint8).reshape(nlines, width)
+    return records
@@ -0,0 +1,332 @@
+# -*- coding: utf-8 -*-
+'''
+Local broadening service.
+
+A long-running HTTP server on localhost that imports every molecule script
+once (so the lookup tables are built once) and keeps the rendered output
+suffixes between requests; a request then costs only the broadening of its
+lines. Start it from the Broadening_Files directory:
+
+    python -m broadeners.server --port 8765 --workers 4
+
+Requests:
+
+    POST /broaden/MOLECULE            body: .par records
+        returns the output lines of the molecule's script for the records,
+        exactly as the script writes them; with ?format=json the model
+        values are returned as JSON columns instead (see below)
+
+    POST /broaden/MOLECULE            body: JSON, Content-Type: application/json
+        {"lines": {"branch": ["P", "R"], "J": [1, 2]},
+         "broadeners": ["H2"], "parameters": ["gamma", "n"], "codes": false}
+        returns {"gamma_H2": [...], "n_H2": [...]} for the quantum-number
+        columns given in "lines", named as in broadeners.registry (QUANTA)
+        and the same for every molecule (integers, branch strings and
+        gamma_air numbers); all keys but "lines" are optional
+
+    GET /models                       the models of broadeners.registry, each
+                                      with the quantum-number columns of
+                                      "lines" it needs ("inputs")
+    GET /stats                        number of requests and their latency
+
+broadeners, parameters and codes can also be given as query parameters
+(?broadeners=H2,He&parameters=gamma&codes=1). MOLECULE is a molecule of
+broadeners.registry; .par records are broadened by the script of that name
+(CO.py for CO), and may also be sent to any other script (e.g.
+CO_with_shifts). Every response carries its processing time in milliseconds
+in an X-Broadening-Time header.
+
+At most --workers requests are broadened at a time and at most --max-queue
+more wait for their turn; further requests are answered with 503 at once,
+before their body is read, rather than piling up. At most
+--max-connections connections are served at a time, each on a thread of a
+fixed pool; idle connections are closed after IDLE_TIMEOUT seconds. Errors in a request are answered with 400 and the
+message of the error.
+'''
+
+import argparse
+import io
+import json
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+
+from broadeners.parfile import records_from_bytes
+from broadeners.registry import (MOLECULES, PARAMETERS, broaden as broaden_models, input_columns,
+                                 load_script, models)
+from broadeners.writer import write_chunk
+
+DEFAULT_PORT = 8765
+DEFAULT_WORKERS = 4
+DEFAULT_MAX_QUEUE = 64
+DEFAULT_MAX_CONNECTIONS = 128
+IDLE_TIMEOUT = 30       # seconds before an idle connection is closed
+MAX_REQUEST_BYTES = 256 * 1024**2
+LATENCY_WINDOW = 1000   # recent requests kept for the latency statistics
+
+class Busy(Exception):
+    pass
+
+#--------------broadening state shared by the requests-------------------------------
+
+class Broadener(object):
+    '''
+    The warm state of the service: the imported scripts, their rendered
+    suffixes and the admission control and statistics of the requests.
+    '''
+
+    def __init__(self, workers=DEFAULT_WORKERS, max_queue=DEFAULT_MAX_QUEUE):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._slots = threading.Semaphore(workers)
+        self._lock = threading.Lock()
+        self._admitted = 0
+        self._caches = {}
+        self.requests = 0
+        self.rejected = 0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+
+    def warm_up(self):
+        '''Import the scripts of all molecules, building their tables.'''
+        for molecule, entry in MOLECULES.items():
+            load_script(molecule)
+            load_script(entry.get('shift_script', entry['script']))
+
+    @contextmanager
+    def admission(self):
+        '''
+        Reserve a place for a request (raise Busy if max_queue requests are
+        already waiting); its body is only read once it has one.
+        '''
+        with self._lock:
+            if self._admitted >= self.workers + self.max_queue:
+                self.rejected += 1
+                raise Busy()
+            self._admitted += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._admitted -= 1
+
+    def run(self, function, *args):
+        '''Call function(*args) of an admitted request in one of the worker slots, waiting for a slot if needed.'''
+        with self._slots:
+            return function(*args)
+
+    def record(self, seconds):
+        with self._lock:
+            self.requests += 1
+            self.latencies.append(seconds)
+
+    def stats(self):
+        '''Return the request counts and latency percentiles (ms) of the recent requests.'''
+        with self._lock:
+            latencies = np.array(self.latencies) * 1000
+            result = {'requests': self.requests, 'rejected': self.rejected,
+                      'in_progress': self._admitted, 'workers': self.workers,
+                      'max_queue': self.max_queue}
+        if len(latencies):
+            result.update({'latency_ms': {'mean': float(latencies.mean()),
+                                          'p50': float(np.percentile(latencies, 50)),
+                                          'p95': float(np.percentile(latencies, 95)),
+                                          'max': float(latencies.max())}})
+        return result
+
+    def par_lines(self, molecule, data):
+        '''Return the output lines of the script of molecule for the .par records in data.'''
+        script = load_script(molecule)
+        records = records_from_bytes(data)
+        cache = self._caches.setdefault(molecule, {})
+        out = io.BytesIO()
+        write_chunk(out, records, script.COLUMNS, script.broaden, script.FORMAT, cache)
+        return out.getvalue()
+
+    def model_values(self, molecule, lines, broadeners=None, parameters=PARAMETERS, codes=False):
+        '''Return the model values of molecule for lines (records or quantum-number columns) as lists.'''
+        if isinstance(lines, bytes):
+            lines = records_from_bytes(lines)
+        values = broaden_models(lines, molecule, broadeners=broadeners, parameters=parameters,
+                                codes=codes)
+        return {name: column.tolist() for name, column in values.items()}
+
+#--------------HTTP-------------------------------
+
+def _names(value):
+    if value is None or isinstance(value, (list, tuple)):
+        return value
+    return [name for name in value.split(',') if name]
+
+class Handler(BaseHTTPRequestHandler):
+    '''Request handler; the server's broadener attribute holds the shared state.'''
+
+    protocol_version = 'HTTP/1.1'
+    timeout = IDLE_TIMEOUT
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            BaseHTTPRequestHandler.log_message(self, format, *args)
+
+    def _send(self, status, body, content_type, started):
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        elapsed = time.perf_counter() - started
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('X-Broadening-Time', '%.3f' % (elapsed * 1000))
+        if status == 503:
+            self.send_header('Retry-After', '1')
+        self.end_headers()
+        self.wfile.write(body)
+        if status == 200:
+            self.server.broadener.record(elapsed)
+
+    def _send_json(self, status, value, started):
+        self._send(status, json.dumps(value), 'application/json', started)
+
+    def _error(self, status, message, started):
+        self._send_json(status, {'error': message}, started)
+
+    def do_GET(self):
+        started = time.perf_counter()
+        path = urlsplit(self.path).path
+        if path == '/models':
+            self._send_json(200, [dict(model._asdict(),
+                                       inputs=input_columns(model.molecule, (model.parameter,)))
+                                  for model in models()], started)
+        elif path == '/stats':
+            self._send_json(200, self.server.broadener.stats(), started)
+        else:
+            self._error(404, 'unknown path %s' % path, started)
+
+    def do_POST(self):
+        started = time.perf_counter()
+        url = urlsplit(self.path)
+        parts = url.path.strip('/').split('/')
+        length = int(self.headers.get('Content-Length') or 0)
+        if length > MAX_REQUEST_BYTES:
+            self.close_connection = True
+            return self._error(413, 'request larger than %d bytes' % MAX_REQUEST_BYTES, started)
+        if len(parts) != 2 or parts[0] != 'broaden':
+            self.close_connection = True
+            return self._error(404, 'unknown path %s' % url.path, started)
+        molecule = parts[1]
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        try:
+            load_script(molecule)
+        except (ValueError, ImportError) as error:
+            self.close_connection = True
+            return self._error(404, str(error), started)
+
+        broadener = self.server.broadener
+        try:
+            with broadener.admission():
+                body = self.rfile.read(length)
+                return self._broaden(broadener, molecule, query, body, started)
+        except Busy:
+            # the body is left unread
+            self.close_connection = True
+            return self._error(503, 'too many requests waiting', started)
+
+    def _broaden(self, broadener, molecule, query, body, started):
+        try:
+            if self.headers.get('Content-Type', '').startswith('application/json'):
+                request = json.loads(body.decode('utf-8'))
+                if not isinstance(request, dict) or not isinstance(request.get('lines'), dict):
+                    raise ValueError('expected a JSON object with a "lines" object')
+                lines = {name: np.asarray(column) for name, column in request['lines'].items()}
+                options = dict(query, **{key: value for key, value in request.items() if key != 'lines'})
+                result = broadener.run(broadener.model_values, molecule, lines,
+                                       _names(options.get('broadeners')),
+                                       _names(options.get('parameters')) or PARAMETERS,
+                                       options.get('codes') in (True, '1', 'true'))
+                return self._send_json(200, result, started)
+            if query.get('format', 'par') == 'json':
+                result = broadener.run(broadener.model_values, molecule, body,
+                                       _names(query.get('broadeners')),
+                                       _names(query.get('parameters')) or PARAMETERS,
+                                       query.get('codes') in ('1', 'true'))
+                return self._send_json(200, result, started)
+            lines = broadener.run(broadener.par_lines, molecule, body)
+            return self._send(200, lines, 'text/plain; charset=latin-1', started)
+        except (ValueError, KeyError, TypeError) as error:
+            return self._error(400, '%s: %s' % (type(error).__name__, error), started)
+
+class BroadeningServer(HTTPServer):
+    '''
+    HTTP server with the shared Broadener of its requests, handling at most
+    max_connections connections at a time on a pool of threads; further
+    connections wait in the listen backlog.
+    '''
+
+    def __init__(self, address, broadener, verbose=False, max_connections=DEFAULT_MAX_CONNECTIONS):
+        HTTPServer.__init__(self, address, Handler)
+        self.broadener = broadener
+        self.verbose = verbose
+        self._connections = threading.BoundedSemaphore(max_connections)
+        self._threads = ThreadPoolExecutor(max_connections)
+
+    def process_request(self, request, client_address):
+        self._connections.acquire()
+        self._threads.submit(self._process, request, client_address)
+
+    def _process(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            self._connections.release()
+
+    def server_close(self):
+        HTTPServer.server_close(self)
+        self._threads.shutdown(wait=False)
+
+def serve(host='127.0.0.1', port=DEFAULT_PORT, workers=DEFAULT_WORKERS,
+          max_queue=DEFAULT_MAX_QUEUE, verbose=False, max_connections=DEFAULT_MAX_CONNECTIONS):
+    '''Warm up the models and serve requests until interrupted.'''
+    broadener = Broadener(workers, max_queue)
+    broadener.warm_up()
+    server = BroadeningServer((host, port), broadener, verbose, max_connections)
+    print('broadening service on http://%s:%d/' % server.server_address[:2], file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m broadeners.server',
+                                     description='Serve broadening requests on a local HTTP port.')
+    parser.add_argument('--host', default='127.0.0.1',
+                        help='address to listen on (default %(default)s, this machine only)')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT,
+                        help='port to listen on (default %(default)s)')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                        help='requests broadened at the same time (default %(default)s)')
+    parser.add_argument('--max-queue', type=int, default=DEFAULT_MAX_QUEUE,
+                        help='requests waiting for a worker before new ones are refused '
+                             '(default %(default)s)')
+    parser.add_argument('--max-connections', type=int, default=DEFAULT_MAX_CONNECTIONS,
+                        help='connections handled at the same time; idle ones are closed after '
+                             '%d s (default %%(default)s)' % IDLE_TIMEOUT)
+    parser.add_argument('--verbose', action='store_true', help='log every request')
+    args = parser.parse_args(argv)
+    if args.workers < 1 or args.max_queue < 0:
+        parser.error('--workers must be at least 1 and --max-queue at least 0')
+    if args.max_connections < 1:
+        parser.error('--max-connections must be at least 1')
+    serve(args.host, args.port, args.workers, args.max_queue, args.verbose, args.max_connections)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+'''
+Pressure-induced line shifts of CO (CO_H2_shifts.py, CO_He_shifts.py and
+CO_CO2_shifts.py).
+
+The shift of a line is a rotational and a vibrational term of |m|,
+
+    delta = y*(alph1_rot + alph2_rot*exp(-|m|*beta2_rot) + alph3_rot*exp(-|m|*beta3_rot))
+          + z*(alph1_vib + alph2_vib*exp(-|m|*beta2_vib) + alph3_vib*exp(-|m|*beta3_vib))
+
+where y is -1, +1 or 0 for R, P and Q lines and z = multiplier*(v' - v") is
+the vibrational multiplier of the line. A model is given as
+
+    dict(rot=(alph1_rot, alph2_rot, alph3_rot, beta2_rot, beta3_rot),
+         vib=(alph1_vib, alph2_vib, alph3_vib, beta2_vib, beta3_vib),
+         multiplier=a)
+
+Both terms only depend on |m|, so shift_table() evaluates the exponentials
+once per |m| (see broadeners.tables) and line_shifts() combines them with
+y and z for a whole chunk of lines in a few array operations.
+'''
+
+import numpy as np
+
+from broadeners.tables import compile_table, lookup
+
+def _term(x, alph1, alph2, alph3, beta2, beta3):
+    return alph1+alph2*np.exp(-x*beta2)+alph3*np.exp(-x*beta3)
+
+def shift(x, y, z, model):
+    '''Return the shift for |m| x, branch sign y and vibrational multiplier z.'''
+    return y*_term(x, *model['rot']) + z*_term(x, *model['vib'])
+
+def shift_table(model, size):
+    '''Return the (rotational, vibrational) terms of model for |m| = 0 .. size-1.'''
+    return compile_table(lambda m: [_term(m, *model['rot']), _term(m, *model['vib'])], size)
+
+def multipliers(v_upper, v_lower, model):
+    '''Return the vibrational multiplier z = multiplier*(v' - v") of every line.'''
+    return model['multiplier']*(np.asarray(v_upper) - np.asarray(v_lower))
+
+def line_shifts(table, m, y, z):
+    '''Return the shift of every line from its |m|, branch sign y and multiplier z.'''
+    rot, vib = lookup(table, m)
+    return y*rot + z*vib
@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+'''
+Columnar binary output store.
+
+Instead of the comma-joined text lines, the broadened line list can be saved
+as a directory of .npy files, one file per column and per chunk of lines,
+with a small JSON manifest:
+
+    sample_CO_out/
+        manifest.json
+        chunk_000000/nu.npy, S.npy, record.npy, gamma_He.npy, err_He.npy, ...
+        chunk_000001/...
+
+Each chunk holds the wavenumber nu, the intensity S, the record number of
+the line in the input .par file (its byte offset is record * record_length)
+and every column returned by the script's broaden(). The manifest lists the
+columns with their dtypes and, for every chunk, its first record, number of
+lines and minimum/maximum wavenumber, so a reader can skip chunks outside its
+spectral window and memory-map only the columns it needs (see load_columns).
+
+When the store is started with a temperature grid, every chunk also holds a
+gamma_X_T column per broadener X: a lines x temperatures float32 array of the
+half width at each temperature of the grid (see broadeners.temperature). The
+grid is saved in the manifest, and so is the shape of every such
+two-dimensional column.
+'''
+
+import json
+import os
+
+import numpy as np
+
+from broadeners.parfile import NU_COLUMN, S_COLUMN, parse_column, parse_columns
+from broadeners.temperature import T_REF, gamma_grid
+from broadeners.writer import key_codes
+
+STORE_FORMAT = 'broadeners-columns'
+STORE_VERSION = 1
+MANIFEST = 'manifest.json'
+
+#--------------per-line values of a chunk-------------------------------
+
+def _column_array(values):
+    # reference IDs and uncertainty codes come as strings of digits; constant
+    # temperature exponents such as '0.5800' are stored as floats
+    array = np.asarray(values)
+    if array.dtype.kind == 'U':
+        try:
+            return array.astype(np.int32)
+        except ValueError:
+            return array.astype(np.float64)
+    return array
+
+def key_values(records, columns, broaden):
+    '''
+    Return the output columns of broaden() for every distinct set of quantum
+    numbers in records, as arrays, and the index of the set of every record.
+    '''
+    keys, first, inverse = np.unique(key_codes(records, columns),
+                                     return_index=True, return_inverse=True)
+    values = {name: _column_array(column) for name, column in
+              broaden(parse_columns(records[first], **columns)).items()}
+    return values, inverse.ravel()
+
+def line_values(records, columns, broaden, temperatures=None):
+    '''
+    Return the output columns of broaden() for every record, as arrays, plus
+    the gamma(T) columns for the temperatures if a grid is given.
+    broaden() is evaluated once per distinct set of quantum numbers.
+    '''
+    values, inverse = key_values(records, columns, broaden)
+    if temperatures is not None:
+        values.update(gamma_grid(values, temperatures))
+    return {name: column[inverse] for name, column in values.items()}
+
+#--------------write a store-------------------------------
+
+def start_store(savepath, source=None, temperatures=None):
+    '''
+    Create the store directory and return its (still empty) manifest; with a
+    list of temperatures (K) the gamma(T) columns are saved as well.
+    '''
+    os.makedirs(savepath, exist_ok=True)
+    if temperatures is not None:
+        temperatures = [float(t) for t in temperatures]
+    return {'format': STORE_FORMAT, 'version': STORE_VERSION, 'source': source,
+            'record_length': None, 'lines': 0, 'columns': {}, 'shapes': {},
+            'chunks': [], 'temperatures': temperatures, 't_ref': T_REF,
+            'path': savepath}
+
+def chunk_columns(store, records, record_numbers):
+    '''Return the nu, S and record columns of a chunk of records.'''
+    if store['record_length'] is None:
+        store['record_length'] = records.shape[1] + 1   # with the newline
+    return {'nu': parse_column(records, *NU_COLUMN).astype(np.float64),
+            'S': parse_column(records, *S_COLUMN).astype(np.float64),
+            'record': np.asarray(record_numbers, dtype=np.int64)}
+
+def new_chunk(store):
+    '''Create the directory of the next chunk and return its name.'''
+    name = 'chunk_%06d' % len(store['chunks'])
+    os.makedirs(os.path.join(store['path'], name), exist_ok=True)
+    return name
+
+def _register_column(store, column, dtype, shape):
+    store['columns'].setdefault(column, np.dtype(dtype).str)
+    if len(shape) > 1:
+        store['shapes'].setdefault(column, list(shape[1:]))
+
+def save_column(store, chunk, column, array):
+    '''Save one column of a chunk.'''
+    np.save(os.path.join(store['path'], chunk, column + '.npy'), array)
+    _register_column(store, column, array.dtype, array.shape)
+
+def open_column(store, chunk, column, shape, dtype):
+    '''
+    Create one column of a chunk as a writable memory-mapped .npy file, for
+    columns too large to be built in memory at once.
+    '''
+    _register_column(store, column, dtype, shape)
+    return np.lib.format.open_memmap(os.path.join(store['path'], chunk, column + '.npy'),
+                                     mode='w+', dtype=dtype, shape=shape)
+
+def end_chunk(store, chunk, data):
+    '''Add a chunk whose columns have been saved, with data its nu and record columns, to the manifest.'''
+    store['chunks'].append({'path': chunk, 'first_record': int(data['record'][0]),
+                            'lines': len(data['nu']),
+                            'nu_min': float(data['nu'].min()),
+                            'nu_max': float(data['nu'].max())})
+    store['lines'] += len(data['nu'])
+
+def add_chunk(store, records, record_numbers, columns, broaden):
+    '''
+    Broaden a chunk of records and save its columns as a new store chunk;
+    record_numbers are the numbers of the records in the input file.
+    '''
+    if len(records) == 0:
+        return
+    data = chunk_columns(store, records, record_numbers)
+    data.update(line_values(records, columns, broaden, store['temperatures']))
+
+    chunk = new_chunk(store)
+    for column, array in data.items():
+        save_column(store, chunk, column, array)
+    end_chunk(store, chunk, data)
+
+def finish_store(store):
+    '''Write the manifest; the store is complete once this has been called.'''
+    manifest = dict(store)
+    del manifest['path']
+    with open(os.path.join(store['path'], MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=1)
+
+#--------------read a store-------------------------------
+
+def read_manifest(storepath):
+    '''Return the manifest of a columnar store.'''
+    with open(os.path.join(storepath, MANIFEST)) as f:
+        manifest = json.load(f)
+    if manifest.get('format') != STORE_FORMAT:
+        raise ValueError('%s is not a broadening column store' % storepath)
+    return manifest
+
+def load_columns(storepath, names, nu_min=None, nu_max=None, mmap=True):
+    '''
+    Return a dict with the named columns of the lines with nu_min <= nu <= nu_max.
+
+    Only chunks whose wavenumber range overlaps the window are opened, and
+    with mmap=True their .npy files are memory-mapped rather than read.
+    '''
+    manifest = read_manifest(storepath)
+    lo = -np.inf if nu_min is None else nu_min
+    hi = np.inf if nu_max is None else nu_max
+    mmap_mode = 'r' if mmap else None
+
+    parts = {name: [] for name in names}
+    for chunk in manifest['chunks']:
+        if chunk['nu_max'] < lo or chunk['nu_min'] > hi:
+            continue
+        path = os.path.join(storepath, chunk['path'])
+        nu = np.load(os.path.join(path, 'nu.npy'), mmap_mode=mmap_mode)
+        inside = np.flatnonzero((nu >= lo) & (nu <= hi))
+        whole = len(inside) == len(nu)
+        for name in names:
+            column = np.load(os.path.join(path, name + '.npy'), mmap_mode=mmap_mode)
+            parts[name].append(column if whole else column[inside])
+
+    result = {}
+    for name in names:
+        if parts[name]:
+            result[name] = np.concatenate(parts[name]) if len(parts[name]) > 1 else parts[name][0]
+        else:
+            shape = (0,) + tuple(manifest.get('shapes', {}).get(name, ()))
+            result[name] = np.zeros(shape, dtype=manifest['columns'].get(name, 'f8'))
+    return result
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+'''
+Lookup tables over the quantum-number keys of the broadening models.
+
+The inputs of the fits only take a small set of discrete values: |m| is an
+integer, J+0.2Ka is one fifth of the integer 5J+Ka, and the PH3 H2 surface
+depends on two clamped integers. So each model is evaluated once, when the
+coefficients are loaded (see broadeners.coefficients), for every key its
+fixed-width .par fields can produce, and broaden() turns the keys of a chunk
+into parameters with one indexed load per line (np.take) instead of
+evaluating the model again.
+'''
+
+import numpy as np
+
+def compile_table(model, *sizes):
+    '''
+    Evaluate model for every integer key 0 <= k < size and return the table.
+
+    With one size, model(k) is called with the array of all keys; with two,
+    model(k0, k1) is called with the two key grids. model may return a single
+    array or a sequence of arrays (one per output column), which are stacked
+    along the first axis; the keys are always the last axes of the table.
+    '''
+    keys = np.meshgrid(*[np.arange(size) for size in sizes], indexing='ij')
+    table = np.asarray(model(*keys))
+    if table.shape[table.ndim - len(sizes):] != tuple(sizes):
+        raise ValueError('model returned shape %s for keys of shape %s'
+                         % (table.shape, tuple(sizes)))
+    return table
+
+def lookup(table, *keys):
+    '''
+    Return the table values for every key, i.e. table[..., k] for one key
+    array or table[..., k0, k1] for two. Keys outside the table are an
+    error; they are never clamped silently.
+    '''
+    ndim = len(keys)
+    shape = table.shape[table.ndim - ndim:]
+    flat = np.ravel_multi_index([np.asarray(k) for k in keys], shape)
+    return np.take(table.reshape(table.shape[:table.ndim - ndim] + (-1,)), flat, axis=-1)
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+'''
+Half widths on a temperature grid.
+
+The scripts give the half width gamma at the HITRAN reference temperature
+T0 = 296 K and its temperature-dependence exponent n; at another temperature
+
+    gamma(T) = gamma(T0) * (T0/T)**n
+
+gamma_grid() evaluates this for every broadener of a broaden() result (every
+gamma_X column with an n_X column next to it) and a whole grid of
+temperatures at once, giving one lines x temperatures float32 array per
+broadener. The columnar store saves these as extra columns named gamma_X_T
+(see broadeners.store and --temperatures on the command line).
+'''
+
+import numpy as np
+
+T_REF = 296.0   # HITRAN reference temperature (K)
+
+GRID_DTYPE = np.float32
+
+def grid_column(name):
+    '''Return the name of the gamma(T) column of the gamma column name.'''
+    return name + '_T'
+
+def broadeners(values):
+    '''Return the broadeners X for which values has both gamma_X and n_X.'''
+    return [name[len('gamma_'):] for name in values
+            if name.startswith('gamma_') and 'n_' + name[len('gamma_'):] in values]
+
+def gamma_t(gamma, n, temperatures, t_ref=T_REF):
+    '''Return gamma(T) for every line (rows) and temperature (columns), as float32.'''
+    gamma = np.asarray(gamma, dtype=np.float64)
+    n = np.asarray(n, dtype=np.float64)
+    ratio = t_ref / np.asarray(temperatures, dtype=np.float64)
+    return (gamma[:, np.newaxis] * ratio[np.newaxis, :] ** n[:, np.newaxis]).astype(GRID_DTYPE)
+
+def gamma_grid(values, temperatures, t_ref=T_REF):
+    '''
+    Return {gamma_X_T: gamma(T) array} for every broadener X in values, the
+    output columns of a broaden() call.
+    '''
+    return {grid_column('gamma_' + gas): gamma_t(values['gamma_' + gas], values['n_' + gas],
+                                                 temperatures, t_ref)
+            for gas in broadeners(values)}
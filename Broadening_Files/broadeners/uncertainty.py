@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+'''
+HITRAN uncertainty codes of the broadening parameters.
+
+The uncertainty code of a fit only changes at a few thresholds of |m| (or
+J+0.2Ka): for CO gamma_H2, for example, the code is 5 up to |m| = 101, 4 up
+to 121 and 3 above. Such a ladder is given as a dict
+
+    dict(thresholds=(101, 121), codes=(5, 4, 3), inclusive=True)
+
+with one more code than thresholds. With inclusive=True a value equal to a
+threshold gets the code below it (x <= 101 gives 5), otherwise the code
+above it (x < 40 gives 5, x >= 40 gives 4). err_code() evaluates a ladder for
+a whole array at once with np.searchsorted and returns uint8 codes.
+'''
+
+import numpy as np
+
+def err_code(x, ladder):
+    '''Return the uncertainty code of the ladder for every x, as uint8.'''
+    thresholds = np.asarray(ladder['thresholds'], dtype=np.float64)
+    codes = np.asarray(ladder['codes'], dtype=np.uint8)
+    if len(codes) != len(thresholds) + 1:
+        raise ValueError('a ladder with %d thresholds needs %d codes, got %d'
+                         % (len(thresholds), len(thresholds) + 1, len(codes)))
+    if np.any(np.diff(thresholds) <= 0):
+        raise ValueError('ladder thresholds must increase: %r' % (ladder['thresholds'],))
+    side = 'left' if ladder.get('inclusive', False) else 'right'
+    return codes[np.searchsorted(thresholds, x, side=side)]
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+'''
+Output writer for the broadening scripts.
+
+Every output line is the 160 .par characters of a record followed by a
+suffix with the computed broadening parameters. The suffix only depends on
+the quantum-number columns the script reads (for example Branch and J for CO),
+and a line list only contains a few hundred or thousand distinct values of
+those. So instead of formatting every line, each distinct suffix is rendered
+once with the script's FORMAT, remembered, and glued onto the raw record
+bytes with NumPy indexing; a chunk is then written with a single call.
+'''
+
+import numpy as np
+
+from broadeners.parfile import PAR_WIDTH, parse_columns
+
+PAR_FORMAT = '%160s'   # the start of every FORMAT: the unchanged .par record
+
+#--------------group the lines of a chunk by their quantum numbers-------------------------------
+
+def key_codes(records, columns):
+    '''
+    Return a key per record made of the raw characters of the quantum-number
+    columns; records with equal keys get the same output suffix.
+    '''
+    positions = np.concatenate([np.arange(start, end + 1) for start, end in
+                                zip(columns['col_starts'], columns['col_ends'])])
+    cells = records[:, positions]
+    if cells.shape[1] <= 8:
+        # small keys are packed into one integer, which is much faster to sort
+        packed = np.zeros((len(cells), 8), dtype=np.uint8)
+        packed[:, :cells.shape[1]] = cells
+        return packed.view(np.uint64).ravel()
+    return np.ascontiguousarray(cells).view('S%d' % cells.shape[1]).ravel()
+
+#--------------render the suffixes-------------------------------
+
+def suffix_format(fmt):
+    '''Return the part of a script FORMAT that follows the 160 .par characters.'''
+    if not fmt.startswith(PAR_FORMAT):
+        raise ValueError('FORMAT must start with %r: %r' % (PAR_FORMAT, fmt))
+    return fmt[len(PAR_FORMAT):]
+
+def render_suffixes(fmt, values):
+    '''Format the output columns in values (as returned by broaden) line by line.'''
+    suffix = suffix_format(fmt)
+    columns = list(values.values())
+    return [(suffix % row).encode('latin-1') for row in zip(*columns)]
+
+#--------------write one chunk-------------------------------
+
+def write_chunk(out, records, columns, broaden, fmt, cache):
+    '''
+    Broaden a chunk of records and write its output lines to the binary file out.
+
+    cache maps keys (see key_codes) to rendered suffixes and is kept between
+    chunks, so broaden() is only called for quantum numbers not seen before.
+    Returns the length in bytes of every line written.
+    '''
+    if len(records) == 0:
+        return np.zeros(0, dtype=np.int64)
+    keys, first, inverse = np.unique(key_codes(records, columns),
+                                     return_index=True, return_inverse=True)
+    keys = keys.tolist()
+    missing = [k for k, key in enumerate(keys) if key not in cache]
+    if missing:
+        total = parse_columns(records[first[missing]], **columns)
+        suffixes = render_suffixes(fmt, broaden(total))
+        if len(suffixes) != len(missing):
+            raise ValueError('broaden() returned %d lines for %d distinct quantum numbers'
+                             % (len(suffixes), len(missing)))
+        for k, suffix in zip(missing, suffixes):
+            cache[keys[k]] = suffix
+
+    suffixes = [cache[key] for key in keys]
+    inverse = inverse.ravel()
+    width = len(suffixes[0])
+    if all(len(suffix) == width for suffix in suffixes):
+        table = np.frombuffer(b''.join(suffixes), dtype=np.uint8).reshape(-1, width)
+        lines = np.empty((len(records), PAR_WIDTH + width), dtype=np.uint8)
+        lines[:, :PAR_WIDTH] = records[:, :PAR_WIDTH]
+        lines[:, PAR_WIDTH:] = table[inverse]
+        out.write(lines.tobytes())
+        return np.full(len(records), PAR_WIDTH + width, dtype=np.int64)
+    else:
+        # suffixes of different length (e.g. a value wider than its field)
+        text = records[:, :PAR_WIDTH].tobytes()
+        out.write(b''.join([text[i * PAR_WIDTH:(i + 1) * PAR_WIDTH] + suffixes[k]
+                            for i, k in enumerate(inverse.tolist())]))
+        widths = np.array([len(suffix) for suffix in suffixes], dtype=np.int64)
+        return PAR_WIDTH + widths[inverse]
@@ -0,0 +1,249 @@
+# -*- coding: utf-8 -*-
+'''
+Line-by-line absorption cross-sections from the computed broadening.
+
+For every layer of an atmosphere profile (see broadeners.profile) the
+cross-section on a wavenumber grid is
+
+    sigma(nu) = sum_i S_i(T) * V(nu - nu_i'; alpha_i, gamma_i)     (cm2/molecule)
+
+where nu_i' is the pressure-shifted position, gamma_i the Lorentz HWHM of the
+broadener mixture, alpha_i the Doppler width and V the area-normalized Voigt
+profile. The intensities are scaled from 296 K with the lower-state energy
+E" of the .par record,
+
+    S(T) = S(T0) * Q(T0)/Q(T) * exp(-c2 E"/T)/exp(-c2 E"/T0)
+                 * (1 - exp(-c2 nu/T))/(1 - exp(-c2 nu/T0)),
+
+and the partition function ratio Q(T0)/Q(T) is the rotational one,
+(T0/T)**1 for linear and (T0/T)**1.5 for nonlinear molecules, unless the
+caller gives the ratios. The Doppler widths use the mass of the principal
+isotopologue of the molecule of each line (MOLECULES).
+
+Each line is only evaluated within wing_cutoff (cm-1) of its center. The
+lines are sorted by position and the grid is cut into segments; the lines of
+a segment are found by bisection and evaluated in blocks of (line, grid
+point) pairs with one vectorized Voigt call per block. Segments are spread
+over a process pool. Only lines within the grid plus the cutoff are read
+(see broadeners.index), and broaden() is called once per distinct set of
+quantum numbers as for the other outputs.
+'''
+
+import math
+import os
+
+import numpy as np
+
+from broadeners.parfile import NU_COLUMN, S_COLUMN, parse_column
+from broadeners.profile import check_broadeners, layer_widths, layer_shifts
+from broadeners.store import key_values
+from broadeners.temperature import T_REF
+
+MOLECULE_COLUMN = (0, 1)   # .par characters of the HITRAN molecule number
+ELOW_COLUMN = (45, 54)     # .par characters of the lower-state energy E" (cm-1)
+
+# HITRAN molecule number: (formula, mass of the principal isotopologue (u), linear)
+MOLECULES = {2: ('CO2', 43.989830, True),
+             4: ('N2O', 44.001062, True),
+             5: ('CO', 27.994915, True),
+             19: ('OCS', 59.966986, True),
+             20: ('H2CO', 30.010565, False),
+             23: ('HCN', 27.010899, True),
+             28: ('PH3', 33.997238, False),
+             31: ('H2S', 33.987721, False)}
+
+C2 = 1.4387769              # second radiation constant (cm K)
+SPEED_OF_LIGHT = 2.99792458e10   # cm/s
+BOLTZMANN = 1.380649e-16    # erg/K
+ATOMIC_MASS = 1.66053907e-24     # g
+
+DEFAULT_WING_CUTOFF = 25.0  # cm-1
+SHIFT_MARGIN = 1.0          # cm-1 read beyond the cutoff for lines shifted into the grid
+SEGMENT_POINTS = 20000      # grid points per task of the process pool
+BLOCK_PAIRS = 2000000       # (line, grid point) pairs evaluated at a time
+
+#--------------line shape-------------------------------
+
+_N = 32
+_L = math.sqrt(_N / math.sqrt(2))
+
+def _weideman_coefficients():
+    k = np.arange(-2*_N + 1, 2*_N)
+    t = _L * np.tan(k * np.pi / (4*_N))
+    f = np.concatenate([[0], np.exp(-t**2) * (_L**2 + t**2)])
+    a = np.real(np.fft.fft(np.fft.fftshift(f))) / (4*_N)
+    return a[1:_N + 1][::-1]
+
+_WEIDEMAN = _weideman_coefficients()
+
+def faddeeva(z):
+    '''
+    Return the Faddeeva function w(z) for Im z >= 0 (Weideman's 32-term
+    rational approximation, SIAM J. Numer. Anal. 31, 1497, 1994).
+    '''
+    z = np.asarray(z, dtype=np.complex128)
+    denominator = _L - 1j*z
+    x = _L + 1j*z
+    x /= denominator
+    # Horner's scheme in place, as in broadeners.pade
+    p = np.full(x.shape, _WEIDEMAN[0], dtype=np.complex128)
+    for a in _WEIDEMAN[1:]:
+        p *= x
+        p += a
+    p *= 2
+    p /= denominator
+    p += 1/math.sqrt(math.pi)
+    p /= denominator
+    return p
+
+def voigt(dnu, alpha, gamma):
+    '''
+    Return the area-normalized Voigt profile (cm) at a distance dnu (cm-1)
+    from the line center, for the Doppler width alpha (the 1/e half width,
+    HWHM/sqrt(ln 2)) and the Lorentz HWHM gamma.
+    '''
+    return faddeeva((dnu + 1j*gamma) / alpha).real / (alpha * math.sqrt(math.pi))
+
+#--------------line parameters at the temperature of a layer-------------------------------
+
+def molecule_masses(molecules):
+    '''Return the mass (u) of every line from its HITRAN molecule number.'''
+    molecules = np.asarray(molecules)
+    known = np.isin(molecules, list(MOLECULES))
+    if not known.all():
+        raise ValueError('no mass for HITRAN molecule(s) %s'
+                         % ', '.join(map(str, np.unique(molecules[~known]))))
+    numbers = np.array(sorted(MOLECULES))
+    masses = np.array([MOLECULES[number][1] for number in numbers])
+    return masses[np.searchsorted(numbers, molecules)]
+
+def partition_ratio(molecule, T, t_ref=T_REF):
+    '''Return the rotational partition function ratio Q(t_ref)/Q(T) of a molecule.'''
+    if molecule not in MOLECULES:
+        raise ValueError('no partition function for HITRAN molecule %s' % molecule)
+    return (t_ref / T) ** (1.0 if MOLECULES[molecule][2] else 1.5)
+
+def doppler_widths(nu, mass, T):
+    '''Return the Doppler 1/e half width (cm-1) of lines at nu with the mass (u) at T.'''
+    return nu / SPEED_OF_LIGHT * np.sqrt(2 * BOLTZMANN * T / (mass * ATOMIC_MASS))
+
+def line_intensities(S, nu, elow, T, q_ratio, t_ref=T_REF):
+    '''Return the intensities S (cm/molecule at t_ref) scaled to T.'''
+    boltzmann = np.exp(-C2 * elow / T) / np.exp(-C2 * elow / t_ref)
+    emission = (-np.expm1(-C2 * nu / T)) / (-np.expm1(-C2 * nu / t_ref))
+    return S * q_ratio * boltzmann * emission
+
+#--------------cross-section of one grid segment-------------------------------
+
+def _pair_blocks(counts):
+    # split the lines into runs of about BLOCK_PAIRS (line, grid point) pairs
+    ends = np.cumsum(counts)
+    cuts = np.searchsorted(ends, np.arange(BLOCK_PAIRS, ends[-1], BLOCK_PAIRS), side='right')
+    edges = np.unique(np.concatenate([[0], cuts, [len(counts)]]))
+    return zip(edges[:-1], edges[1:])
+
+def segment_cross_section(task):
+    '''
+    Return the cross-section on one grid segment; task is (grid, cutoff, nu, S,
+    alpha, gamma), the lines given by their shifted position, intensity and
+    widths.
+    '''
+    grid, cutoff, nu, S, alpha, gamma = task
+    sigma = np.zeros(len(grid))
+    if len(nu) == 0:
+        return sigma
+    lo = np.searchsorted(grid, nu - cutoff, side='left')
+    counts = np.searchsorted(grid, nu + cutoff, side='right') - lo
+    if counts.sum() == 0:
+        return sigma
+    for start, stop in _pair_blocks(counts):
+        n = counts[start:stop]
+        line = np.repeat(np.arange(start, stop), n)
+        point = np.arange(len(line)) - np.repeat(np.cumsum(n) - n, n) + lo[line]
+        profile = voigt(grid[point] - nu[line], alpha[line], gamma[line])
+        sigma += np.bincount(point, weights=S[line] * profile, minlength=len(grid))
+    return sigma
+
+def segment_tasks(grid, cutoff, nu, S, alpha, gamma):
+    '''Split the grid into segments and yield the task of each with its lines.'''
+    order = np.argsort(nu, kind='stable')
+    nu, S, alpha, gamma = nu[order], S[order], alpha[order], gamma[order]
+    for start in range(0, len(grid), SEGMENT_POINTS):
+        segment = grid[start:start + SEGMENT_POINTS]
+        first = np.searchsorted(nu, segment[0] - cutoff, side='left')
+        last = np.searchsorted(nu, segment[-1] + cutoff, side='right')
+        lines = slice(first, last)
+        yield segment, cutoff, nu[lines], S[lines], alpha[lines], gamma[lines]
+
+#--------------cross-sections of a line list-------------------------------
+
+def wavenumber_grid(start, stop, step):
+    '''Return the grid start, start+step, ... up to stop (included if on the grid).'''
+    if step <= 0 or stop < start:
+        raise ValueError('invalid wavenumber grid %r, %r, %r' % (start, stop, step))
+    return start + step * np.arange(int(math.floor((stop - start) / step + 1e-9)) + 1)
+
+def grid_lines(chunks, columns, broaden, profile):
+    '''
+    Return the parameters of the lines in chunks needed for the cross-sections:
+    nu, S, E", molecule and the Lorentz widths and shifts (lines x layers).
+    '''
+    parts = []
+    for numbers, records in chunks:
+        if len(records) == 0:
+            continue
+        values, inverse = key_values(records, columns, broaden)
+        check_broadeners(values, profile)
+        layers = slice(None)
+        parts.append({'nu': parse_column(records, *NU_COLUMN).astype(np.float64),
+                      'S': parse_column(records, *S_COLUMN).astype(np.float64),
+                      'elow': parse_column(records, *ELOW_COLUMN).astype(np.float64),
+                      'molecule': parse_column(records, *MOLECULE_COLUMN),
+                      'gamma': layer_widths(values, profile, layers)[inverse],
+                      'shift': layer_shifts(values, profile, layers)[inverse]})
+    if not parts:
+        nlayers = len(profile['P'])
+        return {'nu': np.zeros(0), 'S': np.zeros(0), 'elow': np.zeros(0),
+                'molecule': np.zeros(0, dtype=np.int64),
+                'gamma': np.zeros((0, nlayers)), 'shift': np.zeros((0, nlayers))}
+    return {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
+
+def cross_sections(lines, profile, grid, wing_cutoff=DEFAULT_WING_CUTOFF, workers=None,
+                   q_ratios=None):
+    '''
+    Return the cross-sections (layers x grid, cm2/molecule) of the lines
+    returned by grid_lines. q_ratios optionally gives Q(296 K)/Q(T) for every
+    layer (one molecule per line list); by default the rotational ratio is used.
+    '''
+    if workers is None:
+        workers = os.cpu_count() or 1
+    molecules = np.unique(lines['molecule'])
+    if q_ratios is not None and len(molecules) > 1:
+        raise ValueError('partition function ratios given for a list of several molecules')
+    mass = molecule_masses(lines['molecule'])
+
+    sigma = np.zeros((len(profile['T']), len(grid)))
+    if workers > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        pool = ProcessPoolExecutor(workers)
+    else:
+        pool = None
+    try:
+        for layer, T in enumerate(profile['T']):
+            if q_ratios is not None:
+                q_ratio = q_ratios[layer]
+            else:
+                q_ratio = np.ones(len(mass))
+                for molecule in molecules:
+                    q_ratio[lines['molecule'] == molecule] = partition_ratio(molecule, T)
+            tasks = segment_tasks(grid, wing_cutoff,
+                                  lines['nu'] + lines['shift'][:, layer],
+                                  line_intensities(lines['S'], lines['nu'], lines['elow'], T, q_ratio),
+                                  doppler_widths(lines['nu'], mass, T),
+                                  lines['gamma'][:, layer])
+            segments = pool.map(segment_cross_section, tasks) if pool else map(segment_cross_section, tasks)
+            sigma[layer] = np.concatenate(list(segments))
+    finally:
+        if pool:
+            pool.shutdown()
+    return sigma
@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+'''
+Regression tests of the broadening scripts.
+
+Every script is run on its sample input in Input-Broadening-Files and its
+output is compared byte for byte with the sample output in
+Output-Broadening-Files, on every path through broadeners.pipeline: serial,
+in small chunks, on several processes, with overlapped input and output,
+compressed and incremental. Run them from the repository or the
+Broadening_Files directory with
+
+    python -m pytest -q
+'''
+
+import bz2
+import gzip
+import lzma
+import os
+import shutil
+import subprocess
+import sys
+from contextlib import nullcontext
+
+import pytest
+
+HERE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if HERE not in sys.path:
+    sys.path.insert(0, HERE)
+
+from broadeners.pipeline import broaden_file
+from broadeners.registry import load_script
+
+INPUTS = os.path.join(HERE, 'Input-Broadening-Files')
+OUTPUTS = os.path.join(HERE, 'Output-Broadening-Files')
+
+SCRIPTS = ('CO', 'CO2', 'H2CO', 'H2S', 'HCN', 'N2O', 'OCS', 'PH3',
+           'CO_He_shifts', 'CO_H2_shifts', 'CO_CO2_shifts', 'CO_with_shifts')
+
+def sample_input(name):
+    # the CO shift scripts broaden the CO sample
+    return os.path.join(INPUTS, 'sample_%s.par' % name.split('_')[0])
+
+def sample_output(name):
+    with open(os.path.join(OUTPUTS, 'sample_%s_out.par' % name), 'rb') as f:
+        return f.read()
+
+def broaden_sample(name, savepath, readpath=None, **options):
+    script = load_script(name)
+    return broaden_file(readpath or sample_input(name), str(savepath), script.COLUMNS,
+                        script.broaden, script.FORMAT, **options)
+
+def read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+#--------------every script on every path-------------------------------
+
+@pytest.mark.parametrize('name', SCRIPTS)
+@pytest.mark.parametrize('options', [{}, {'chunk_lines': 997}, {'workers': 2},
+                                     {'workers': 3, 'chunk_lines': 500}, {'overlap': True}],
+                         ids=['serial', 'chunks', 'workers', 'workers-chunks', 'overlap'])
+def test_sample_output(tmp_path, name, options):
+    savepath = tmp_path / 'out.par'
+    broaden_sample(name, savepath, **options)
+    assert read(savepath) == sample_output(name)
+
+def test_script_command_line(tmp_path):
+    savepath = tmp_path / 'out.par'
+    subprocess.run([sys.executable, os.path.join(HERE, 'CO.py'), sample_input('CO'),
+                    str(savepath)], check=True, stdout=subprocess.DEVNULL)
+    assert read(savepath) == sample_output('CO')
+
+#--------------compressed input and output-------------------------------
+
+@pytest.mark.parametrize('ext, module', [('.gz', gzip), ('.bz2', bz2), ('.xz', lzma)])
+@pytest.mark.parametrize('options', [{}, {'overlap': True}, {'workers': 2}],
+                         ids=['serial', 'overlap', 'workers'])
+def test_compressed(tmp_path, ext, module, options):
+    readpath = tmp_path / ('in.par' + ext)
+    with module.open(readpath, 'wb') as f:
+        f.write(read(sample_input('CO')))
+    savepath = tmp_path / ('out.par' + ext)
+    # a compressed input cannot be cut into ranges and is broadened on one process
+    with pytest.warns(UserWarning) if 'workers' in options else nullcontext():
+        broaden_sample('CO', savepath, readpath=str(readpath), **options)
+    with module.open(savepath, 'rb') as f:
+        assert f.read() == sample_output('CO')
+
+def test_compressed_output_on_workers(tmp_path):
+    savepath = tmp_path / 'out.par.gz'
+    broaden_sample('H2S', savepath, workers=2, compress_workers=2)
+    with gzip.open(savepath, 'rb') as f:
+        assert f.read() == sample_output('H2S')
+
+#--------------incremental output-------------------------------
+
+def test_incremental(tmp_path):
+    savepath = tmp_path / 'out.par'
+    broaden_sample('CO_with_shifts', savepath, incremental=True)
+    assert read(savepath) == sample_output('CO_with_shifts')
+    broaden_sample('CO_with_shifts', savepath, incremental=True)
+    assert read(savepath) == sample_output('CO_with_shifts')
+
+def test_incremental_changed_lines(tmp_path):
+    # the updated list has lines removed and others moved to the end
+    lines = read(sample_input('OCS')).splitlines(True)
+    readpath = tmp_path / 'in.par'
+    with open(readpath, 'wb') as f:
+        f.writelines(lines)
+    savepath = tmp_path / 'out.par'
+    broaden_sample('OCS', savepath, readpath=str(readpath), incremental=True)
+    updated = lines[100:2000] + lines[2500:] + lines[:100]
+    with open(readpath, 'wb') as f:
+        f.writelines(updated)
+    broaden_sample('OCS', savepath, readpath=str(readpath), incremental=True)
+    broaden_sample('OCS', tmp_path / 'serial.par', readpath=str(readpath))
+    assert read(savepath) == read(tmp_path / 'serial.par')
+
+#--------------state shared between runs in one process-------------------------------
+
+def test_parallel_cache_per_script(tmp_path):
+    # CO_He_shifts and CO_H2_shifts have the same columns and format
+    for name in ('CO_He_shifts', 'CO_H2_shifts', 'CO_He_shifts'):
+        savepath = tmp_path / ('%s.par' % name)
+        broaden_sample(name, savepath, workers=2)
+        assert read(savepath) == sample_output(name)
+
+#--------------errors-------------------------------
+
+def test_missing_input_keeps_output(tmp_path):
+    savepath = tmp_path / 'out.par'
+    shutil.copy(sample_input('CO'), savepath)
+    with pytest.raises(FileNotFoundError):
+        broaden_sample('CO', savepath, readpath=str(tmp_path / 'missing.par'))
+    assert read(savepath) == read(sample_input('CO'))
+
+def test_output_is_input(tmp_path):
+    readpath = tmp_path / 'in.par'
+    shutil.copy(sample_input('CO'), readpath)
+    with pytest.raises(ValueError):
+        broaden_sample('CO', readpath, readpath=str(readpath))
+    assert read(readpath) == read(sample_input('CO'))